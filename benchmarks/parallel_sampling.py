@@ -0,0 +1,86 @@
+"""
+Scaling of repository sampling from one to N worker processes or threads.
+
+A synthetic workbook with many version 2 parameters is written to a temporary directory and loaded. It is sampled
+serially and with `ParameterRepository.sample_parallel` for increasing numbers of workers of each executor.
+
+    python benchmarks/parallel_sampling.py --parameters 5000 --samples 500 --workers 1 2 4 8 --executors process thread
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from table_data_reader import ParameterRepository
+from table_data_reader.table_handlers import TableParameterLoader
+
+HEADER = ['variable', 'scenario', 'type', 'ref value', 'param', 'initial_value_proportional_variation', 'unit',
+          'mean growth', 'variability growth', 'ref date', 'label', 'comment', 'source', 'control', 'scenario notes',
+          'description', 'ui variable', 'user name', 'id', 'order']
+
+
+def write_workbook(path, parameters, seed=0):
+    rng = np.random.default_rng(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Sheet1'
+    ws.append(HEADER)
+    for i in range(parameters):
+        if i % 10 == 0:
+            row = [f'p{i}', None, 'interp', '{"2015-01-01": %.2f, "2030-01-01": %.2f}' % tuple(rng.uniform(1, 100, 2)),
+                   'linear', 0.2, 'kg', 0, 0.05]
+        else:
+            row = [f'p{i}', None, 'exp', str(round(rng.uniform(1, 100), 2)), None, round(rng.uniform(0.05, 0.5), 2),
+                   'kg', round(rng.uniform(-0.2, 0.2), 3), round(rng.uniform(0, 0.1), 3)]
+        ws.append(row + [datetime.datetime(2015, 1, 1), f'synthetic {i}'] + [None] * 7 + [i + 1, i + 1])
+    wb.save(path)
+
+
+def load_repository(path):
+    repository = ParameterRepository()
+    TableParameterLoader(filename=path, table_handler='openpyxl').load_into_repo(sheet_name='Sheet1',
+                                                                                 repository=repository)
+    return repository
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--parameters', type=int, default=5000)
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--months', type=int, default=240)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument('--executors', nargs='+', default=['process', 'thread'], choices=['process', 'thread'])
+    args = parser.parse_args()
+
+    settings = {'use_time_series': True, 'sample_size': args.samples, 'seed': 1, 'lazy_result': True,
+                'times': pd.date_range('2015-01-01', periods=args.months, freq='MS'), 'log_negative_values': False}
+    print(f'{args.parameters} parameters x {args.months} months x {args.samples} samples on {os.cpu_count()} CPUs')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synthetic.xlsx')
+        write_workbook(path, args.parameters)
+        repository = load_repository(path)
+
+    names = list(repository.parameter_sets.keys())
+    start = time.perf_counter()
+    for name in names:
+        repository[name](settings)
+    serial = time.perf_counter() - start
+    print(f'serial: {serial:.2f}s')
+
+    for executor in args.executors:
+        for workers in sorted(set(args.workers)):
+            repository.clear_cache()
+            start = time.perf_counter()
+            repository.sample_parallel(settings, max_workers=workers, executor=executor)
+            elapsed = time.perf_counter() - start
+            print(f'{workers} {executor} workers: {elapsed:.2f}s, speedup {serial / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Memory held by the parameter definitions of a large repository.
+
+A synthetic workbook with many version 2 parameters is written to a temporary directory and loaded while tracing
+allocations. Reports the memory of the loaded repository in total and per parameter, and the share of the Parameter
+objects themselves (their attributes and containers, not the row values they refer to).
+
+    python benchmarks/parameter_memory.py --parameters 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from parallel_sampling import load_repository, write_workbook
+from table_data_reader import Parameter
+
+
+def object_bytes(parameter: Parameter) -> int:
+    # the instance plus the containers it owns, without allocating lazy ones
+    size = sys.getsizeof(parameter)
+    state = getattr(parameter, '__dict__', None)
+    if state is None:
+        state = {name: getattr(parameter, name, None) for name in type(parameter).__slots__}
+    else:
+        size += sys.getsizeof(state)
+    for name in ['kwargs', '_cache', 'processes', '_processes', '_lock']:
+        if state.get(name) is not None:
+            size += sys.getsizeof(state[name])
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--parameters', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synthetic.xlsx')
+        write_workbook(path, args.parameters)
+
+        gc.collect()
+        tracemalloc.start()
+        repository = load_repository(path)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    parameters = [p for p_set in repository.parameter_sets.values() for p in p_set.scenarios.values()]
+    objects = sum(object_bytes(p) for p in parameters)
+    print(f'{len(parameters)} parameters: repository {current / 2 ** 20:.1f} MiB '
+          f'({current / len(parameters):.0f} bytes per parameter), load peak {peak / 2 ** 20:.1f} MiB')
+    print(f'Parameter objects and their containers: {objects / len(parameters):.0f} bytes per parameter')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Sample counts needed to reach a target standard error with the 'mc', 'lhs' and 'sobol' sampling modes.
+
+Every parameter of a workbook is sampled repeatedly with different seeds. The standard error of the sample mean is the
+standard deviation of the estimates of the repetitions. For each parameter and mode the smallest power-of-two sample
+size with a relative standard error below the target is reported.
+
+    python benchmarks/sampling_convergence.py --workbook tests/test_v2.xlsx --target 0.005
+"""
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from table_data_reader import ParameterRepository
+from table_data_reader.sampling import SAMPLING_MODES
+from table_data_reader.table_handlers import TableParameterLoader
+
+
+def load_repository(workbook, sheet_name):
+    repository = ParameterRepository()
+    TableParameterLoader(filename=workbook, table_handler='openpyxl').load_into_repo(sheet_name=sheet_name,
+                                                                                     repository=repository)
+    return repository
+
+
+def relative_standard_error(parameter, settings, replications):
+    estimates = []
+    for seed in range(replications):
+        parameter.cache = None
+        estimates.append(np.asarray(parameter({**settings, 'seed': seed, 'lazy_result': True}).array).mean())
+    estimates = np.array(estimates)
+    return estimates.std(ddof=1) / abs(estimates.mean())
+
+
+def required_samples(parameter, times, mode, target, replications, max_samples):
+    size = 2
+    while size <= max_samples:
+        settings = {'use_time_series': True, 'times': times, 'sample_size': size, 'sampling_mode': mode,
+                    'log_negative_values': False}
+        if relative_standard_error(parameter, settings, replications) <= target:
+            return size
+        size *= 2
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workbook', default='tests/test_v2.xlsx')
+    parser.add_argument('--sheet', default='Sheet1')
+    parser.add_argument('--target', type=float, default=0.005, help='target relative standard error of the mean')
+    parser.add_argument('--replications', type=int, default=32)
+    parser.add_argument('--max-samples', type=int, default=2 ** 14)
+    parser.add_argument('--start', default='2009-01-01')
+    parser.add_argument('--end', default='2020-12-01')
+    args = parser.parse_args()
+
+    # sobol warns about sample sizes that are not powers of two, all sizes here are
+    warnings.filterwarnings('ignore', module='scipy.stats._qmc')
+    times = pd.date_range(args.start, args.end, freq='MS')
+    repository = load_repository(args.workbook, args.sheet)
+
+    rows = []
+    for name, parameter_set in repository.parameter_sets.items():
+        for scenario, parameter in parameter_set.scenarios.items():
+            row = {'name': name, 'scenario': scenario}
+            try:
+                for mode in SAMPLING_MODES:
+                    row[mode] = required_samples(parameter, times, mode, args.target, args.replications,
+                                                 args.max_samples)
+            except Exception as e:
+                print(f'skipping {name} ({scenario}): {e!r}')
+                continue
+            rows.append(row)
+
+    report = pd.DataFrame(rows)
+    print(f'samples to reach a relative standard error of {args.target} (None: more than {args.max_samples})')
+    print(report.to_string(index=False))
+    for mode in SAMPLING_MODES[1:]:
+        ratio = (report['mc'] / report[mode]).dropna()
+        if len(ratio):
+            print(f'mc / {mode}: median reduction {ratio.median():.1f}x')
+
+
+if __name__ == '__main__':
+    main()
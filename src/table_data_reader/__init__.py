@@ -1,30 +1,39 @@
 __version__ = '1.0.0'
 
 import csv
-import datetime
-import importlib
+import sys
+import threading
+import time
 
 from abc import abstractmethod
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from typing import Dict, List, Set
 
 import numpy as np
 import pandas as pd
-from dateutil import relativedelta as rdelta
 
 import logging
 from functools import partial
 
-import calendar
-
 from openpyxl import Workbook
-from scipy.interpolate import interp1d
-import json
 from typing import Callable
 
 import pint
 import pint_pandas
 
+from table_data_reader.time_axis import MonthAxis, month_axis
+from table_data_reader.growth import growth_coefficients, growth_vector, growth_matrix, cached_growth_vector
+from table_data_reader.interpolation import parse_interp_knots, linear_interpolation
+from table_data_reader.results import SampleResult, SampleCube, build_series, magnitudes, sample_index
+from table_data_reader.diagnostics import NegativeValues, find_non_positive
+from table_data_reader.sampling import RandomStreams, SAMPLING_MODES, MC, stratified_uniform, \
+    unit_triangular_ppf, unit_triangular_block, inverse_cdf, generator_function, warn_unseeded
+from table_data_reader.blocks import SampleBlock, plan_blocks
+from table_data_reader.caching import CacheManager, DiskCache, fingerprint
+from table_data_reader.parallel import sample_in_processes, sample_in_threads
+from table_data_reader.distributions import DistributionRegistry, ResolvedDistribution, UnknownDistributionError, \
+    distribution_registry, parse_distribution_params
+
 __author__ = 'schien'
 
 # import pkg_resources  # part of setuptools
@@ -57,6 +66,16 @@ param_name_maps = {1: param_name_map_v1, 2: param_name_map_v2}
 # logger.basicConfig(level=logger.DEBUG)
 logger = logging.getLogger(__name__)
 
+# number of differently sampled values (e.g. for different sample sizes or horizons) each parameter keeps
+PARAMETER_CACHE_SIZE = 4
+# guards the creation of the locks of parameters, which only exist once a parameter is sampled
+_lock_creation = threading.Lock()
+
+
+def _intern(value):
+    # repeated strings of a workbook, such as units, types and tags, are stored once
+    return sys.intern(value) if type(value) is str else value
+
 
 class DistributionFunctionGenerator(object):
     module: str
@@ -76,51 +95,48 @@ class DistributionFunctionGenerator(object):
         :param param_b:
         :param param_c:
         :param size:
-        :param kwargs: can contain key "sample_mean_value" with bool value
+        :param kwargs: can contain key "sample_mean_value" with bool value, key "dtype" with the float dtype of
+            the generated values, key "random_streams" with the :class:`RandomStreams` of the parameter and key
+            "sampling_mode", one of 'mc' (default), 'lhs' or 'sobol', and key "distribution" with the
+            :class:`ResolvedDistribution` of the parameter
         """
         self.kwargs = kwargs
         self.size = size
         self.module_name = module_name
         self.distribution_name = distribution_name
         self.sample_mean_value = kwargs.get('sample_mean_value', False)
-        # prepare function arguments
-        if distribution_name == 'choice':
-            if type(param_a) == str:
-                tokens = param_a.split(',')
-                params = [float(token.strip()) for token in tokens]
-                self.random_function_params = [np.array(params, dtype=np.float)]
-            else:
-                self.random_function_params = [np.array([i for i in [param_a, param_b, param_c] if i], dtype=np.float)]
-
-            logger.debug(f'setting function params for choice distribution {self.random_function_params}')
+        self.dtype = kwargs.get('dtype', None)
+        # without random streams, sampling uses the global numpy.random state
+        self.random_streams = kwargs.get('random_streams', None)
+        self.sampling_mode = kwargs.get('sampling_mode', MC)
+        if self.sampling_mode not in SAMPLING_MODES:
+            raise ValueError(f'Unknown sampling mode {self.sampling_mode}, expected one of {SAMPLING_MODES}')
+        # set by generators that check their values, see find_non_positive
+        self.negative_values = None
+        # function and arguments, usually resolved once when the parameter was defined
+        self.distribution = kwargs.get('distribution', None)
+        if self.distribution is not None:
+            self.random_function_params = self.distribution.params
         else:
-            self.random_function_params = [i for i in [param_a, param_b, param_c] if i not in [None, ""]]
+            self.random_function_params = parse_distribution_params(distribution_name, param_a, param_b, param_c)
 
-    def get_mean(self, distribution_function):
+    def get_mean(self, distribution_function=None):
         """Get the mean value for a distribution.
-        If the distribution function is [normal, uniform,choice,triangular] the analytic value is being calculted.
-        Else, the distribution is instantiated and then the mean is being calculated.
 
-        :param distribution_function:
+        The analytic mean is looked up in the distribution registry, see :meth:`DistributionRegistry.mean`, so
+        random numbers are never drawn.
+
+        :param distribution_function: not used, kept for compatibility
         :return: the mean as a scalar
         """
-        name = self.distribution_name
-        params = self.random_function_params
-        if name == 'normal':
-            return params[0]
-        if name == 'uniform':
-            return (params[0] + params[1]) / 2.
-        if name == 'choice':
-            return params[0].mean()
-        if name == 'triangular':
-            return (params[0] + params[1] + params[2]) / 3.
-        return distribution_function().mean()
+        return distribution_registry.mean(self.module_name, self.distribution_name, self.random_function_params)
 
     def generate_values(self, *args, **kwargs):
         """
         Generate a sample of values by sampling from a distribution. The size of the sample can be overriden with the 'size' kwarg.
 
-        If `self.sample_mean_value == True` the sample will contain "size" times the mean value.
+        If `self.sample_mean_value == True` the sample will contain "size" times the mean value. With the
+        "lazy_result" kwarg that sample is a read-only view of the mean rather than a new array.
 
         :param args:
         :param kwargs:
@@ -130,27 +146,96 @@ class DistributionFunctionGenerator(object):
         """
         sample_size = kwargs.get('size', self.size)
 
-        f = self.instantiate_distribution_function(self.module_name, self.distribution_name)
-        distribution_function = partial(f, *self.random_function_params, size=sample_size)
-
         if self.sample_mean_value:
-            sample = np.full(sample_size, self.get_mean(distribution_function))
+            if kwargs.get('lazy_result'):
+                return np.broadcast_to(np.asarray(self.get_mean(), dtype=self.dtype), sample_size)
+            return np.full(sample_size, self.get_mean(), dtype=self.dtype)
+
+        if self.random_streams and self.module_name == 'numpy.random':
+            f = generator_function(self.random_state(), self.distribution_name)
         else:
-            sample = distribution_function()
+            if self.distribution is not None:
+                f = self.distribution.function
+            else:
+                f = self.instantiate_distribution_function(self.module_name, self.distribution_name)
+            if self.module_name == 'scipy.stats' and hasattr(f, 'rvs'):
+                # calling a scipy.stats distribution freezes it, rvs samples from it
+                f = partial(f.rvs, random_state=self.random_state() if self.random_streams else None)
+            elif self.random_streams:
+                warn_unseeded(self.module_name, self.distribution_name)
+        distribution_function = partial(f, *self.random_function_params, size=sample_size)
 
+        sample = None
+        if self.sampling_mode != MC:
+            sample = self.generate_stratified_values(sample_size)
+        if sample is None:
+            sample = distribution_function()
+        if self.dtype is not None:
+            sample = sample.astype(self.dtype, copy=False)
         return sample
 
+    def generate_blocks(self, *args, max_bytes=None, months_per_block=None, samples_per_block=None, **kwargs):
+        """
+        Yield the values of :meth:`generate_values` as :class:`SampleBlock` objects.
+
+        This generates the full sample and slices it, so it does not bound memory. Generators that can draw blocks
+        directly override it.
+
+        :return: iterator of :class:`SampleBlock`
+        """
+        result = self.generate_values(*args, **{**kwargs, 'lazy_result': True})
+        values = np.asarray(getattr(result, 'array', result))
+        if values.ndim == 1:
+            for _, samples in plan_blocks(1, len(values), itemsize=values.itemsize, max_bytes=max_bytes,
+                                          samples_per_block=samples_per_block):
+                yield SampleBlock(None, samples, values[samples])
+            return
+        for months, samples in plan_blocks(values.shape[0], values.shape[1], int(np.prod(values.shape[2:])),
+                                           values.itemsize, max_bytes, months_per_block, samples_per_block):
+            yield SampleBlock(months, samples, values[months, samples])
+
+    def generate_stratified_values(self, size):
+        """
+        Sample with the latin hypercube or Sobol' sampling mode by mapping stratified uniforms through the inverse CDF
+        of the distribution.
+
+        :param size: the sample size or a shape with the samples on the last axis
+        :return: the sample or None if the inverse CDF of the distribution is not known
+        """
+        ppf = inverse_cdf(self.module_name, self.distribution_name)
+        if ppf is None:
+            logger.warning(f'No inverse CDF for {self.module_name}.{self.distribution_name}, '
+                           f'falling back to {MC} sampling')
+            return None
+        shape = tuple(size) if isinstance(size, (tuple, list)) else (size,)
+        u = stratified_uniform(shape, self.sampling_mode, self.random_state())
+        return np.asarray(ppf(u, *self.random_function_params))
+
+    def random_state(self, group=None):
+        """
+        The source of random numbers: the parameter's (and group's) own `np.random.Generator` if sampling is seeded,
+        the global `numpy.random` module otherwise.
+        """
+        if self.random_streams:
+            return self.random_streams.generator(group)
+        return np.random
+
     @staticmethod
     def instantiate_distribution_function(module_name, distribution_name):
-        module = importlib.import_module(module_name)
-        func = getattr(module, distribution_name)
-        return func
+        return distribution_registry.function(module_name, distribution_name)
 
 
 class Parameter(object):
     """
     A single parameter
+
+    Large repositories hold many parameters, so they are slotted and only allocate their cache, lock and usage
+    records when these are first needed.
     """
+    __slots__ = ('version', 'source', 'comment', 'unit', 'source_scenarios_string', 'tags', 'name', 'scenario',
+                 '_cache', '_cache_key', 'cache_size', 'cache_manager', 'disk_cache', '_lock', 'negative_values',
+                 '_processes', 'kwargs', '__weakref__')
+
     version: int
 
     name: str
@@ -172,66 +257,260 @@ class Parameter(object):
         self.source = source
         self.comment = comment
 
-        self.unit = unit
-        self.source_scenarios_string = source_scenarios_string
-        self.tags = tags
-        self.name = name
+        self.unit = _intern(unit)
+        self.source_scenarios_string = _intern(source_scenarios_string)
+        self.tags = _intern(tags)
+        self.name = _intern(name)
 
         self.scenario = None
-        self.cache = None
+        # sampled values and negative values by settings fingerprint, least recently used first
+        self._cache = None
+        self._cache_key = None
+        self.cache_size = PARAMETER_CACHE_SIZE
+        # optional CacheManager that bounds the memory of the caches of many parameters
+        self.cache_manager = None
+        # optional DiskCache that keeps seeded samples across runs
+        self.disk_cache = None
+        # guards the cache when parameters are sampled from several threads
+        self._lock = None
+        # values <= 0 found in the cached sample, see ParameterRepository.negative_values_report
+        self.negative_values = None
 
         # track the usages of this parameter per process as a list of
         # process-specific variable names that are backed by this parameter
-        self.processes = defaultdict(list)
-
+        self._processes = None
+
+        # parse the knots of interp variables once, rather than on every sample
+        if kwargs.get('type') == 'interp' and kwargs.get('ref value') and 'interp_knots' not in kwargs:
+            kwargs['interp_knots'] = parse_interp_knots(kwargs['ref value'])
+        # resolve the distribution function once - raises UnknownDistributionError for unknown distributions
+        if kwargs.get('module_name') and kwargs.get('distribution_name') and 'distribution' not in kwargs:
+            kwargs['distribution'] = distribution_registry.resolve(kwargs['module_name'], kwargs['distribution_name'],
+                                                                   kwargs.get('param_a'), kwargs.get('param_b'),
+                                                                   kwargs.get('param_c'))
+        for key, value in kwargs.items():
+            kwargs[key] = _intern(value)
         self.kwargs = kwargs
 
     def __call__(self, settings=None, *args, **kwargs):
         """
-        Samples from a parameter. Values are cached and returns the same value every time called.
+        Samples from a parameter. Values are cached and returns the same value every time called with the same
+        settings, args and kwargs.
 
         @todo confusing interface that accepts 'settings' and kwargs  at the same time.
         worse- 'use_time_series' must be present in the settings dict
-        settings, kwargs and args are also ignored after the first call because of caching
+
+        The cache keeps the values of the last `cache_size` different settings, see :func:`fingerprint`. A
+        :class:`CacheManager` may evict them earlier. With a :class:`DiskCache`, seeded samples are read from and
+        written to disk.
 
         :param args:
         :param kwargs: pass-through to generator
         :return:
         """
-        if self.cache is None:
-            kwargs['name'] = self.name
-            kwargs['unit'] = self.unit
-            kwargs['tags'] = self.tags
-            kwargs['scenario'] = self.scenario
-
-            if not settings:
-                settings = {}
-
-            common_args = {
-                'size': settings.get('sample_size', 1),
-                'sample_mean_value': settings.get('sample_mean_value', False),
-                'with_pint_units': settings.get('with_pint_units', False)
-            }
-            common_args.update(**self.kwargs)
-
-            if settings.get('use_time_series', False):
-                if self.version == 2:
-                    generator = GrowthTimeSeriesGenerator(**common_args, times=settings['times'])
-                else:
-                    generator = ConstantUncertaintyExponentialGrowthTimeSeriesGenerator(**common_args,
-                                                                                        times=settings['times'])
+        key = fingerprint(settings, args, kwargs)
+        value = self._cache_lookup(key)
+        if value is None:
+            with self._sampling_lock():
+                # another thread may have sampled while this one waited
+                value = self._cache_lookup(key)
+                if value is None:
+                    start = time.perf_counter()
+                    value, negative_values = self._generate(settings, args, kwargs)
+                    self._cache_put(key, value, negative_values, time.perf_counter() - start)
+        return value
+
+    def _generate(self, settings, args, kwargs):
+        disk_cache = self.disk_cache if settings and settings.get('seed') is not None else None
+        if disk_cache is not None:
+            try:
+                disk_key = disk_cache.key(self, settings, args, kwargs)
+            except TypeError as e:
+                logger.warning(f'Not caching {self.name} on disk: {e}')
+                disk_cache = None
+        if disk_cache is not None:
+            loaded = disk_cache.load(disk_key, settings)
+            if loaded is not None:
+                return loaded
+
+        generator, generator_kwargs = self._prepare_generator(settings, dict(kwargs))
+        if disk_cache is None:
+            return generator.generate_values(*args, **generator_kwargs), generator.negative_values
+        # store the raw array, but return the generated values rather than the file
+        result = generator.generate_values(*args, **{**generator_kwargs, 'lazy_result': True})
+        disk_cache.store(disk_key, result, generator.negative_values)
+        return disk_cache.as_called(result, settings), generator.negative_values
+
+    @property
+    def cache(self):
+        """
+        The most recently sampled or used value, None if nothing is cached. Setting it to None clears the cache.
+        """
+        return self._cache[self._cache_key][0] if self._cache and self._cache_key in self._cache else None
+
+    @cache.setter
+    def cache(self, value):
+        if value is None:
+            self.clear_cache()
+        else:
+            self._cache_put(self._cache_key, value, self.negative_values)
+
+    def clear_cache(self):
+        self._cache = None
+        self._cache_key = None
+        self.negative_values = None
+        if self.cache_manager is not None:
+            self.cache_manager.discard(self)
+
+    def _sampling_lock(self):
+        if self._lock is None:
+            with _lock_creation:
+                if self._lock is None:
+                    self._lock = threading.Lock()
+        return self._lock
+
+    def _cache_get(self, key):
+        cache = self._cache
+        entry = cache.get(key) if cache else None
+        if entry is None:
+            return None
+        try:
+            cache.move_to_end(key)
+        except KeyError:
+            # evicted by another thread in the meantime
+            pass
+        self._cache_key = key
+        self.negative_values = entry[1]
+        return entry[0]
+
+    def _cache_lookup(self, key):
+        # a read of the cached value on behalf of a caller, counted as a hit by the cache manager
+        value = self._cache_get(key)
+        if value is not None and self.cache_manager is not None:
+            self.cache_manager.hit(self, key)
+        return value
+
+    def _cache_put(self, key, value, negative_values, cost=0.):
+        if self._cache is None:
+            self._cache = OrderedDict()
+        self._cache[key] = (value, negative_values)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            if self.cache_manager is not None:
+                self.cache_manager.discard(self, evicted, evicted=True)
+        self._cache_key = key
+        self.negative_values = negative_values
+        if self.cache_manager is not None:
+            self.cache_manager.put(self, key, value, cost)
+
+    def _cache_evict(self, key):
+        # called by the cache manager
+        if self._cache:
+            self._cache.pop(key, None)
+
+    @property
+    def processes(self) -> Dict[str, List]:
+        if self._processes is None:
+            self._processes = defaultdict(list)
+        return self._processes
+
+    @processes.setter
+    def processes(self, value):
+        self._processes = value
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__ if name != '__weakref__' and hasattr(self, name)}
+        # copies share cached values, not the cache, its lock or its manager
+        state['_lock'] = None
+        state['_cache'] = OrderedDict(self._cache) if self._cache else None
+        state['cache_manager'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def iter_blocks(self, settings=None, max_bytes=None, months_per_block=None, samples_per_block=None, *args,
+                    **kwargs):
+        """
+        Sample from a parameter block by block, without materialising (or caching) all values at once.
+
+        Blocks are :class:`SampleBlock` tuples of month and sample slices and the values shaped
+        (months, samples[, groups]). Concatenating the blocks gives the values of a full call with the same settings.
+        With a seed and the 'mc' sampling mode, time series parameters generate each block on its own within the
+        memory budget, otherwise the full values are generated and split.
+
+        :param settings: as for :meth:`__call__`
+        :param max_bytes: memory budget of a block
+        :param months_per_block: explicit number of months per block
+        :param samples_per_block: explicit number of samples per block
+        :return: iterator of :class:`SampleBlock`
+        """
+        generator, kwargs = self._prepare_generator(settings, kwargs)
+        yield from generator.generate_blocks(*args, max_bytes=max_bytes, months_per_block=months_per_block,
+                                             samples_per_block=samples_per_block, **kwargs)
+        self.negative_values = generator.negative_values
+
+    def sample_shape(self, settings=None):
+        """
+        The shape and dtype of the samples of this parameter, without generating them.
+
+        Time series are shaped (months, samples) or (months, samples, groups), other parameters (samples,). The dtype
+        is the 'dtype' setting, float64 by default.
+        """
+        settings = settings or {}
+        size = settings.get('sample_size', 1)
+        dtype = np.dtype(settings.get('dtype') or np.float64)
+        if not settings.get('use_time_series', False):
+            return (size,), dtype
+        shape = (len(settings['times']), size)
+        if settings.get('with_group') and self.name in settings.get('group_vars') and settings.get('groupings'):
+            shape += (len(settings['groupings']),)
+        return shape, dtype
+
+    def _prepare_generator(self, settings, kwargs):
+        kwargs['name'] = self.name
+        kwargs['unit'] = self.unit
+        kwargs['tags'] = self.tags
+        kwargs['scenario'] = self.scenario
+
+        if not settings:
+            settings = {}
+
+        common_args = {
+            'size': settings.get('sample_size', 1),
+            'sample_mean_value': settings.get('sample_mean_value', False),
+            'with_pint_units': settings.get('with_pint_units', False),
+            'dtype': settings.get('dtype', None),
+            'sampling_mode': settings.get('sampling_mode', MC),
+            'antithetic': settings.get('antithetic', False)
+        }
+        common_args.update(**self.kwargs)
+        if settings.get('seed') is not None:
+            common_args['random_streams'] = RandomStreams(settings['seed'], self.name, self.scenario)
+
+        if settings.get('use_time_series', False):
+            if self.version == 2:
+                generator = GrowthTimeSeriesGenerator(**common_args, times=settings['times'])
             else:
-                # raise ValueError('\'use_time_series\' must be present in the settings dict')
-                generator = DistributionFunctionGenerator(**common_args)
-
-            # is this is a group variable?
-            # @todo refactor - use 'with_group' as a global switch and auto-lookup country variables as you go along
-            if settings.get('with_group'):
-                kwargs['with_group'] = settings['with_group'] and kwargs['name'] in settings.get('group_vars')
-                kwargs['group_flag'] = kwargs['name'] in settings['group_vars']
-                kwargs['groupings'] = settings['groupings'] if 'groupings' in settings else None
-            self.cache = generator.generate_values(*args, **kwargs)
-        return self.cache
+                generator = ConstantUncertaintyExponentialGrowthTimeSeriesGenerator(**common_args,
+                                                                                    times=settings['times'])
+        else:
+            # raise ValueError('\'use_time_series\' must be present in the settings dict')
+            generator = DistributionFunctionGenerator(**common_args)
+
+        # is this is a group variable?
+        # @todo refactor - use 'with_group' as a global switch and auto-lookup country variables as you go along
+        if settings.get('with_group'):
+            kwargs['with_group'] = settings['with_group'] and kwargs['name'] in settings.get('group_vars')
+            kwargs['group_flag'] = kwargs['name'] in settings['group_vars']
+            kwargs['groupings'] = settings['groupings'] if 'groupings' in settings else None
+        if settings.get('lazy_result'):
+            kwargs['lazy_result'] = True
+        if not settings.get('log_negative_values', True):
+            kwargs['log_negative_values'] = False
+        return generator, kwargs
 
     def add_usage(self, process_name, variable_name):
         # add the name of a variable of a process model that is backed by this parameter
@@ -257,176 +536,262 @@ class GrowthTimeSeriesGenerator(DistributionFunctionGenerator):
             import pint
         self.times = times
         self.size = size
-        iterables = [times, range(0, size)]
-        self._multi_index = pd.MultiIndex.from_product(iterables, names=index_names)
-        assert type(times.freq) == pd.tseries.offsets.MonthBegin, 'Time index must have monthly frequency'
+        self.axis = month_axis(times)
+        self.index_names = index_names if index_names else (None, None)
+        self.dtype = np.dtype(self.dtype or 'float64')
+        self.antithetic = self.kwargs.get('antithetic', False)
 
-    def generate_sigmas(self, group=None):
+    def variability(self, group=None):
+        """
+        The bound of the triangular noise of a (group of a) parameter: initial value times the proportional variation
+        """
         if self.kwargs['type'] == 'interp':
-
-            def get_date(record):
-                return datetime.datetime.strptime(record[0], "%Y-%m-%d")
-
-            ref_value = self.kwargs['ref value'][group] if group else self.kwargs['ref value']
-            ref_value_ = sorted(json.loads(ref_value.strip()).items(), key=get_date)
-            intial_value = ref_value_[0][1]
+            # the value of the earliest knot
+            intial_value = self.interp_knots(group)[1][0]
         else:
             intial_value = float(self.kwargs['ref value'][group]) if group else float(self.kwargs['ref value'])
 
         initial_value_proportional_variation = self.kwargs['initial_value_proportional_variation'][
             group] if group else self.kwargs['initial_value_proportional_variation']
-        variability_ = intial_value * initial_value_proportional_variation
-        logger.debug(f'sampling random distribution with parameters -{variability_}, 0, {variability_}')
-        sigma = np.random.triangular(-1 * variability_, 0, variability_, (len(self.times), self.size))
-        return sigma
+        return intial_value * initial_value_proportional_variation
 
-    def generate_values(self, *args, **kwargs):
+    def unit_noise(self, shape):
         """
-        Instantiate a random variable and apply annual growth factors.
+        Symmetric unit triangular noise, `triangular(-1, 0, 1)`, from the stream of the parameter.
+
+        With the 'lhs' and 'sobol' sampling modes the noise is stratified over the samples of each month (and group).
 
+        With antithetic sampling only half of the samples are drawn: samples 2k and 2k + 1 form a pair with mirrored
+        noise, so averages over the samples axis cancel the noise pairwise. An odd last sample has no partner.
+
+        :param shape: (months, samples) or (months, samples, groups)
         :return:
+        """
+        if self.antithetic:
+            size = shape[1]
+            drawn = self.draw_unit_noise(shape[:1] + ((size + 1) // 2,) + tuple(shape[2:]))
+            noise = np.empty(shape, dtype=drawn.dtype)
+            noise[:, 0::2] = drawn
+            np.negative(drawn[:, :size // 2], out=noise[:, 1::2])
+            return noise
+        return self.draw_unit_noise(shape)
+
+    def draw_unit_noise(self, shape):
+        if self.sampling_mode != MC:
+            return unit_triangular_ppf(stratified_uniform(shape, self.sampling_mode, self.random_state(), axis=1))
+        return self.random_state().triangular(-1, 0, 1, shape)
+
+    def unit_noise_block(self, shape, months: slice, samples: slice):
+        """
+        The block `[months, samples]` of :meth:`unit_noise` of the given full shape, drawn without the rest.
+
+        Needs the random streams of a seeded run and the 'mc' sampling mode.
+        """
+        if not self.random_streams or self.sampling_mode != MC:
+            raise ValueError('Drawing blocks of noise needs a seed and the mc sampling mode')
+        if not self.antithetic:
+            return unit_triangular_block(self.random_state(), shape, months, samples)
+        size = shape[1]
+        s0, s1, _ = samples.indices(size)
+        first = s0 // 2
+        drawn = unit_triangular_block(self.random_state(), shape[:1] + ((size + 1) // 2,) + tuple(shape[2:]), months,
+                                      slice(first, (s1 - 1) // 2 + 1))
+        # sample j takes the noise drawn for pair j // 2, mirrored for odd j
+        j = np.arange(s0, s1)
+        noise = drawn[:, j // 2 - first]
+        odd = j % 2 == 1
+        noise[:, odd] = np.negative(noise[:, odd])
+        return noise
+
+    def noise_shape(self, groupings=None):
+        if groupings:
+            return len(self.times), self.size, len(groupings)
+        return len(self.times), self.size
+
+    def variabilities(self, groupings=None):
+        if groupings:
+            return np.array([self.variability(c) for c in groupings])
+        return self.variability()
+
+    def generate_sigmas(self, groupings=None):
+        """
+        Draw the noise of all groups at once.
 
-        todo: this is very long and opaque
+        `triangular(-v, 0, v)` is `v * triangular(-1, 0, 1)`, so a single unit noise draw is scaled by the
+        variability of each group instead of drawing once per group.
+
+        :param groupings: optional groups of a group variable
+        :return: array shaped (months, samples, groups) for group variables and (months, samples) otherwise
+        """
+        shape = self.noise_shape(groupings)
+        variability_ = self.variabilities(groupings)
+        logger.debug(f'sampling unit triangular noise {shape} scaled by {variability_}')
+        sigma = self.unit_noise(shape)
+        sigma *= variability_
+        return sigma.astype(self.dtype, copy=False)
+
+    def generate_trend(self, **kwargs):
+        """
+        The mean values and the growth of the noise.
+
+        :return: tuple (mu, alpha_sigma) of arrays shaped (months, 1, groups) for group variables and (months, 1)
+            otherwise, that broadcast against the noise
         """
         assert 'ref value' in self.kwargs
         # 1. Generate $\mu$
-        start_date = self.times[0].to_pydatetime()
-        end_date = self.times[-1].to_pydatetime()
         ref_date = self.ref_date
         if not ref_date:
             raise Exception(f"Ref date not set for variable {kwargs['name']}")
 
-        mu = {}
+        months = self.axis.months
+        groupings = kwargs['groupings'] if kwargs.get('with_group') else None
 
-        if kwargs.get('with_group'):
-            for c in kwargs['groupings']:
-                mu[c] = self.generate_mu(end_date, ref_date, start_date, group=c, **kwargs)
+        # all arrays are shaped (months, samples, groups) for group variables and (months, samples) otherwise,
+        # with axes of length one where values are constant, so that they broadcast against each other
+        if groupings:
+            mu = self.generate_group_mu(ref_date, **kwargs)[:, np.newaxis, :]
         else:
-            mu = self.generate_mu(end_date, ref_date, start_date, **kwargs)
-        # 3. Generate $\sigma$
-        # Prepare array with growth values $\sigma$
-        if self.sample_mean_value:
-            sigma = np.zeros((len(self.times), self.size))
-        else:
-            if kwargs.get('with_group'):
-                sigma = {}
-                for c in kwargs['groupings']:
-                    sigma[c] = self.generate_sigmas(group=c)
-            else:
-                sigma = self.generate_sigmas()
-        # logger.debug(ref_date.strftime("%b %d %Y"))
+            mu = self.generate_mu(ref_date, **kwargs).reshape(months, 1)
 
         # 4. Prepare growth array for $\alpha_{sigma}$
-        if kwargs.get('with_group'):
-            alpha_sigma = {}
-            for c in kwargs['groupings']:
-                growth_factor = self.kwargs['ef_growth_factor'][c] if isinstance(self.kwargs['ef_growth_factor'],
-                                                                                 dict) else self.kwargs['ef_growth_factor']
-                # growth_factor = self.kwargs['ef_growth_factor'][c]
-                alpha_sigma[c] = growth_coefficients(start_date,
-                                                     end_date,
-                                                     ref_date,
-                                                     growth_factor, 1)
+        if groupings:
+            growth_factors = [self._group_value('ef_growth_factor', c) for c in groupings]
+            # one batched pass for all groups
+            alpha_sigma = growth_matrix(self.axis, ref_date, growth_factors,
+                                        dtype=self.dtype)[:, np.newaxis, :]
         else:
-            alpha_sigma = growth_coefficients(start_date,
-                                              end_date,
-                                              ref_date,
-                                              self.kwargs['ef_growth_factor'], 1)
-        # 5. Prepare DataFrame
-        iterables = [self.times, range(self.size)]
-        index_names = ['time', 'samples']
-        _multi_index = pd.MultiIndex.from_product(iterables, names=index_names)
-
-        # logger.debug(start_date)
-        # logger.debug(end_date)
-        from dateutil import relativedelta
-        r = relativedelta.relativedelta(end_date, start_date)
-        months = r.years * 12 + r.months + 1
-        name = kwargs['name']
-        # Apply growth to $\sigma$ and add $\sigma$ to $\mu$
-        # logger.debug(sigma.size)
-        # logger.debug(alpha_sigma.shape)
-        # logger.debug(months)
-        if self.with_pint_units:
-            unit_ = kwargs["unit"]
-            if not unit_:
-                unit_ = 'dimensionless'
-            dtype = f'pint[{unit_}]'
-        else:
-            dtype = 'float64'
-
-        if kwargs.get('with_group'):
-            iterables = [self.times, range(self.size), kwargs['groupings']]
-            index_names = ['time', 'samples', 'group']
-            group_multi_index = pd.MultiIndex.from_product(iterables, names=index_names)
-
-            # Multiply each value of alpha_sigma by sigma.
-            if not self.sample_mean_value:
-                alpha_sigma.update((group, value * sigma[group]) for group, value in alpha_sigma.items())
-            else:
-                alpha_sigma.update((group, value * sigma) for group, value in alpha_sigma.items())
+            alpha_sigma = cached_growth_vector(self.axis, ref_date, self.kwargs['ef_growth_factor'],
+                                               self.dtype)[:, np.newaxis]
+        return mu, alpha_sigma
 
-            temp = {}
-            for group in kwargs['groupings']:
-                # Compute values from sigmas and mus.
-                temp[group] = [alpha_sigma[group][i] + mu[group][i] for i in range(len(self.times))]
-
-            data = []
-            # Rearrange data to match index order.
-            for i in range(len(self.times)):
-                for j in range(self.size):
-                    for group in kwargs['groupings']:
-                        data.append(temp[group][i][j])
+    def generate_values(self, *args, **kwargs):
+        """
+        Instantiate a random variable and apply annual growth factors.
 
-            series = pd.Series(data, index=group_multi_index, dtype=dtype)
+        :return:
+        """
+        name = kwargs['name']
+        groupings = kwargs['groupings'] if kwargs.get('with_group') else None
+        mu, alpha_sigma = self.generate_trend(**kwargs)
+        if self.sample_mean_value:
+            # all samples equal the trend: a read-only view of it, materialised only on demand
+            values = np.broadcast_to(mu, self.noise_shape(groupings))
+            self.negative_values = find_non_positive(mu, self.times, repeats=self.size)
         else:
-            series = pd.Series(((sigma * alpha_sigma) + mu.reshape(months, 1)).ravel(), index=_multi_index,
-                               dtype=dtype)
+            # 3. Generate $\sigma$
+            sigma = self.generate_sigmas(groupings)
+            # Apply growth to $\sigma$ and add $\sigma$ to $\mu$
+            # the C-ordered result is already in index order (time, samples[, group])
+            values = (sigma * alpha_sigma) + mu
+            # test if values has sub-zero values
+            self.negative_values = find_non_positive(values, self.times)
+        if self.negative_values and kwargs.get('log_negative_values', True):
+            logger.warning(f"Negative values for parameter {name} from {self.negative_values.first_month}")
+
+        # 5. Prepare Series
+        result = SampleResult(values, self.times, self.size, groupings, kwargs['unit'], self.with_pint_units)
+        return result if kwargs.get('lazy_result') else result.to_series()
+
+    def generate_blocks(self, *args, max_bytes=None, months_per_block=None, samples_per_block=None, **kwargs):
+        """
+        Generate the values block by block within a memory budget.
 
-        # test if df has sub-zero values
-        df_sigma__dropna = series[series <= 0]
+        Seeded runs in the 'mc' sampling mode draw each block directly from the random stream of the parameter, so
+        the concatenated blocks equal the values of :meth:`generate_values` with the same seed. Other runs fall back
+        to slicing the full values. The blocks of `sample_mean_value` runs are read-only views of the trend.
 
-        if self.with_pint_units:
-            _values = df_sigma__dropna.pint.m
-        else:
-            _values = df_sigma__dropna
+        :param max_bytes: memory budget of a block, see :func:`plan_blocks`
+        :param months_per_block:
+        :param samples_per_block:
+        :return: iterator of :class:`SampleBlock`
+        """
+        if not self.sample_mean_value and (not self.random_streams or self.sampling_mode != MC):
+            logger.info(f"Generating all values of {kwargs['name']} before splitting them into blocks")
+            yield from super().generate_blocks(*args, max_bytes=max_bytes, months_per_block=months_per_block,
+                                               samples_per_block=samples_per_block, **kwargs)
+            return
+
+        name = kwargs['name']
+        groupings = kwargs['groupings'] if kwargs.get('with_group') else None
+        mu, alpha_sigma = self.generate_trend(**kwargs)
+        shape = self.noise_shape(groupings)
+        variability_ = self.variabilities(groupings)
+
+        self.negative_values = None
+        for months, samples in plan_blocks(shape[0], shape[1], int(np.prod(shape[2:])), self.dtype.itemsize,
+                                           max_bytes, months_per_block, samples_per_block):
+            if self.sample_mean_value:
+                values = np.broadcast_to(mu[months], (months.stop - months.start, samples.stop - samples.start)
+                                         + shape[2:])
+                negative_values = find_non_positive(mu[months], self.times[months],
+                                                    repeats=samples.stop - samples.start)
+            else:
+                sigma = self.unit_noise_block(shape, months, samples)
+                sigma *= variability_
+                sigma = sigma.astype(self.dtype, copy=False)
+                # in place, to stay within the budget
+                values = sigma
+                values *= alpha_sigma[months]
+                values += mu[months]
+                negative_values = find_non_positive(values, self.times[months])
+            if negative_values:
+                if self.negative_values:
+                    negative_values = NegativeValues(min(self.negative_values.first_month,
+                                                         negative_values.first_month),
+                                                     self.negative_values.count + negative_values.count)
+                self.negative_values = negative_values
+            yield SampleBlock(months, samples, values)
+
+        if self.negative_values and kwargs.get('log_negative_values', True):
+            logger.warning(f"Negative values for parameter {name} from {self.negative_values.first_month}")
+
+    def _group_value(self, key, group):
+        value = self.kwargs[key]
+        return value[group] if isinstance(value, dict) else value
+
+    def generate_group_mu(self, ref_date, **kwargs):
+        """
+        Generate the mean values for all groups in `kwargs['groupings']` of a group variable.
 
-        if not _values.empty:
-            logger.warning(f"Negative values for parameter {name} from {df_sigma__dropna.index[0][0]}")
+        :return: array of shape (months, groups)
+        """
+        groupings = kwargs['groupings']
+        if self.kwargs['type'] == 'exp':
+            ref_values = np.array([float(self._group_value('ref value', c)) for c in groupings], dtype=self.dtype)
+            growth_factors = [self._group_value('growth_factor', c) for c in groupings]
+            return ref_values * growth_matrix(self.axis, ref_date, growth_factors,
+                                              dtype=self.dtype)
+        return np.column_stack([self.generate_mu(ref_date, group=c, **kwargs) for c in groupings])
 
-        return series
+    def interp_knots(self, group=None):
+        """
+        The (seconds, values) knots of an interp variable, parsed from the ref value unless pre-parsed by the Parameter.
+        """
+        knots = self.kwargs.get('interp_knots')
+        if knots is None:
+            knots = parse_interp_knots(self.kwargs['ref value'])
+        return knots[group] if group and isinstance(knots, dict) else knots
 
-    def generate_mu(self, end_date, ref_date, start_date, group=None, **kwargs):
+    def generate_mu(self, ref_date, group=None, **kwargs):
         if self.kwargs['type'] == 'exp':
             ref_value = self.kwargs['ref value'][group] if group and isinstance(self.kwargs['ref value'], dict) else \
                 self.kwargs['ref value']
-            mu_bar = np.full(len(self.times), float(ref_value))
             # 2. Apply Growth to Mean Values $\alpha_{mu}$
             growth_factor = self.kwargs['growth_factor'][group] if group and isinstance(
                 self.kwargs['growth_factor'], dict) else self.kwargs['growth_factor']
-            alpha_mu = growth_coefficients(start_date,
-                                           end_date,
-                                           ref_date,
-                                           growth_factor, 1)
-            mu = mu_bar * alpha_mu.ravel()
+            alpha_mu = cached_growth_vector(self.axis, ref_date, growth_factor, self.dtype)
+            mu = self.dtype.type(ref_value) * alpha_mu
             mu = mu.reshape(len(self.times), 1)
             return mu
         elif self.kwargs['type'] == 'interp':
-            def toTimestamp(d):
-                return calendar.timegm(d.timetuple())
-
-            def interpolate(growth_config: Dict[str, float], date_range, kind='linear'):
-                arr1 = np.array([toTimestamp(datetime.datetime.strptime(date_val, '%Y-%m-%d')) for date_val in
-                                 growth_config.keys()])
-                arr2 = np.array([val for val in growth_config.values()])
-
-                f = interp1d(arr1, arr2, kind=kind, fill_value='extrapolate')
-                return f([toTimestamp(date_val) for date_val in date_range])
-
-            ref_value_ = json.loads(self.kwargs['ref value'][group].strip()) if group and isinstance(
-                self.kwargs['ref value'], dict) else json.loads(
-                self.kwargs['ref value'].strip())
-            return interpolate(ref_value_, self.times, self.kwargs['param'])
+            seconds, values = self.interp_knots(group)
+            kind = self.kwargs.get('param') or 'linear'
+            if kind == 'linear':
+                mu = linear_interpolation(self.axis.seconds, seconds, values)
+            else:
+                from scipy.interpolate import interp1d
+                mu = interp1d(seconds, values, kind=kind, fill_value='extrapolate')(self.axis.seconds)
+            return mu.astype(self.dtype, copy=False)
         else:
             raise Exception(f"no variable type set for variable {kwargs['name']}")
 
@@ -446,9 +811,9 @@ class ConstantUncertaintyExponentialGrowthTimeSeriesGenerator(DistributionFuncti
             import pint
         self.times = times
         self.size = size
-        iterables = [times, range(0, size)]
-        self._multi_index = pd.MultiIndex.from_product(iterables, names=index_names)
-        assert type(times.freq) == pd.tseries.offsets.MonthBegin, 'Time index must have monthly frequency'
+        self.axis = month_axis(times)
+        self.index_names = index_names if index_names else (None, None)
+        self.dtype = np.dtype(self.dtype or 'float64')
 
     def generate_values(self, *args, **kwargs):
         """
@@ -456,21 +821,24 @@ class ConstantUncertaintyExponentialGrowthTimeSeriesGenerator(DistributionFuncti
 
         :return:
         """
-        values = super().generate_values(*args, **kwargs, size=(len(self.times) * self.size,))
         alpha = self.cagr
 
         # @todo - fill to cover the entire time: define rules for filling first
-        ref_date = self.ref_date if self.ref_date else self.times[0].to_pydatetime()
+        ref_date = self.ref_date if self.ref_date else self.axis.start
         # assert ref_date >= self.times[0].to_pydatetime(), 'Ref date must be within variable time span.'
         # assert ref_date <= self.times[-1].to_pydatetime(), 'Ref date must be within variable time span.'
 
-        start_date = self.times[0].to_pydatetime()
-        end_date = self.times[-1].to_pydatetime()
-
-        a = growth_coefficients(start_date, end_date, ref_date, alpha, self.size)
+        # growth is identical for all samples - broadcast the month vector over the sample axis
+        a = cached_growth_vector(self.axis, ref_date, alpha, self.dtype)
 
-        x = a.ravel()
-        values = np.multiply(values, x)
+        if self.sample_mean_value:
+            # all samples equal the trend: a read-only view of it, materialised only on demand
+            trend = self.dtype.type(self.get_mean()) * a
+            values = np.broadcast_to(trend[:, np.newaxis], (self.axis.months, self.size))
+        else:
+            # samples on the last axis, so that stratified sampling modes stratify the samples of each month
+            values = super().generate_values(*args, **kwargs, size=(len(self.times), self.size))
+            values = np.multiply(values.reshape(self.axis.months, self.size), a[:, np.newaxis])
 
         # df = pd.DataFrame(values)
         # df.columns = [kwargs['name']]
@@ -480,68 +848,17 @@ class ConstantUncertaintyExponentialGrowthTimeSeriesGenerator(DistributionFuncti
         # data_series._metadata = kwargs
         # data_series.index.rename(['time', 'samples'], inplace=True)
         #
-        if self.with_pint_units:
-            if not kwargs["unit"]:
-                dtype = 'pint[dimensionless]'
-            else:
-                dtype = f'pint[{kwargs["unit"]}]'
-        else:
-            dtype = 'float64'
-
-        series = pd.Series(values, index=self._multi_index, dtype=dtype)
-        return series
-
-
-def growth_coefficients(start_date, end_date, ref_date, alpha, samples):
-    """
-    Build a matrix of growth factors according to the CAGR formula  y'=y0 (1+a)^(t'-t0).
-
-    a growth rate alpha
-    t0 start date
-    t' end date
-    y' output
-    y0 start value
-
-    """
-
-    start_offset = 0
-    if ref_date < start_date:
-        offset_delta = rdelta.relativedelta(start_date, ref_date)
-        start_offset = offset_delta.months + 12 * offset_delta.years
-        start_date = ref_date
-
-    end_offset = 0
-    if ref_date > end_date:
-        offset_delta = rdelta.relativedelta(ref_date, end_date)
-        end_offset = offset_delta.months + 12 * offset_delta.years
-        end_date = ref_date
-
-    delta_ar = rdelta.relativedelta(ref_date, start_date)
-    ar = delta_ar.months + 12 * delta_ar.years
-    delta_br = rdelta.relativedelta(end_date, ref_date)
-    br = delta_br.months + 12 * delta_br.years
-
-    # we place the ref point on the lower interval (delta_ar + 1) but let it start from 0
-    # in turn we let the upper interval start from 1
-    g = np.fromfunction(lambda i, j: np.power(1 - alpha, np.abs(i) / 12), (ar + 1, samples), dtype=float)
-    h = np.fromfunction(lambda i, j: np.power(1 + alpha, np.abs(i + 1) / 12), (br, samples), dtype=float)
-    g = np.flipud(g)
-
-    # now join the two arrays
-    a = np.vstack((g, h))
-
-    if start_offset > 0:
-        a = a[start_offset:]
-    if end_offset > 0:
-        a = a[:-end_offset]
-
-    return a
+        result = SampleResult(values, self.times, self.size, unit=kwargs['unit'], with_pint_units=self.with_pint_units,
+                              index_names=self.index_names)
+        return result if kwargs.get('lazy_result') else result.to_series()
 
 
 class ParameterScenarioSet(object):
     """
     The set of all version of a parameter for all the scenarios.
     """
+    __slots__ = ('scenarios',)
+
     default_scenario = 'default'
 
     "the name of the parameters in this set"
@@ -580,9 +897,16 @@ class ParameterRepository(object):
     parameter_sets: Dict[str, ParameterScenarioSet]
     tags: Dict[str, Dict[str, Set[Parameter]]]
 
-    def __init__(self):
+    def __init__(self, cache_manager: CacheManager = None, disk_cache: DiskCache = None):
+        """
+        :param cache_manager: optional :class:`CacheManager` that bounds the memory of the cached samples of all
+            parameters added to the repository
+        :param disk_cache: optional :class:`DiskCache` that keeps the seeded samples of the parameters across runs
+        """
         self.parameter_sets = defaultdict(ParameterScenarioSet)
         self.tags = defaultdict(lambda: defaultdict(set))
+        self.cache_manager = cache_manager
+        self.disk_cache = disk_cache
 
     def add_all(self, parameters: List[Parameter]):
         for p in parameters:
@@ -591,7 +915,127 @@ class ParameterRepository(object):
     def clear_cache(self):
         for p_sets in self.parameter_sets.values():
             for param_name, param in p_sets.scenarios.items():
-                param.cache = None
+                param.clear_cache()
+        sample_index.cache_clear()
+
+    def negative_values_report(self) -> pd.DataFrame:
+        """
+        Collect the values <= 0 found in the cached samples of all parameters.
+
+        Use together with the setting `'log_negative_values': False` to replace the warning logged per parameter
+        in large runs.
+
+        :return: DataFrame with columns name, scenario, first_month and count, one row per affected parameter
+        """
+        rows = []
+        for param_name, p_set in self.parameter_sets.items():
+            for scenario, param in p_set.scenarios.items():
+                if param.negative_values:
+                    rows.append((param_name, scenario, param.negative_values.first_month,
+                                 param.negative_values.count))
+        return pd.DataFrame(rows, columns=['name', 'scenario', 'first_month', 'count'])
+
+    def sample_parallel(self, settings=None, names=None, scenario=ParameterScenarioSet.default_scenario,
+                        max_workers=None, executor='process'):
+        """
+        Sample many parameters in a pool and cache the values, as if each parameter had been called.
+
+        With the 'process' executor, workers write into one shared memory block, see :func:`sample_in_processes`.
+        Samples are then stored with the 'dtype' setting, float64 by default. The 'thread' executor samples the
+        parameters from a thread pool, see :func:`sample_in_threads`. It has less overhead and relies on NumPy
+        releasing the GIL. Already cached parameters are not sampled again.
+
+        With a seed the values equal those of serial calls with the same seed. Without one, a seed is drawn from the
+        global numpy.random state so that every parameter has its own random stream.
+
+        :param settings: as for :meth:`Parameter.__call__`
+        :param names: names of the parameters, all parameters by default
+        :param scenario: the scenario, parameters without it use the default scenario
+        :param max_workers: number of workers, by default the number of CPUs
+        :param executor: 'process' or 'thread'
+        :return: dict of parameter name to value
+        """
+        settings = settings or {}
+        parameters = {name: self.get_parameter(name, scenario)
+                      for name in (names if names is not None else list(self.parameter_sets.keys()))}
+        key = fingerprint(settings)
+        results = {name: p._cache_lookup(key) for name, p in parameters.items()}
+        pending = {name: parameters[name] for name, value in results.items() if value is None}
+        if pending:
+            if executor not in ('process', 'thread'):
+                raise ValueError(f"Unknown executor {executor}, expected 'process' or 'thread'")
+            start = time.perf_counter()
+            sample = sample_in_processes if executor == 'process' else sample_in_threads
+            values = sample(pending, settings, max_workers)
+            # the cost of regenerating a value, spread evenly over the parameters
+            cost = (time.perf_counter() - start) / len(pending)
+            # cache under the caller's settings, also if the workers were given a drawn seed
+            for name, (value, negative_values) in values.items():
+                pending[name]._cache_put(key, value, negative_values, cost)
+                results[name] = value
+        return results
+
+    def sample_all(self, settings=None, names=None, scenario=ParameterScenarioSet.default_scenario, order='C',
+                   max_bytes=None) -> SampleCube:
+        """
+        Sample several parameters into one preallocated array instead of concatenating their series.
+
+        The cube is shaped (params, months, samples[, groups]) for time series and (params, samples) otherwise.
+        Parameters that are not group variables are repeated over the groups. Values are plain magnitudes with the
+        'dtype' setting, float64 by default.
+
+        Cached values are copied into the cube. Other parameters are generated block by block straight into their
+        slot, see :meth:`Parameter.iter_blocks`, and are not cached.
+
+        :param settings: as for :meth:`Parameter.__call__`
+        :param names: names of the parameters, all parameters by default
+        :param scenario: the scenario, parameters without it use the default scenario
+        :param order: memory layout of the cube, 'C' (the values of each parameter are contiguous) or 'F' (the values
+            of all parameters of a sample are contiguous)
+        :param max_bytes: memory budget of the blocks that are generated at once
+        :return: :class:`SampleCube`
+        """
+        if order not in ('C', 'F'):
+            raise ValueError(f"Unknown memory layout {order}, expected 'C' or 'F'")
+        settings = settings or {}
+        names = list(names if names is not None else self.parameter_sets.keys())
+        parameters = [self.get_parameter(name, scenario) for name in names]
+        dtype = np.dtype(settings.get('dtype') or np.float64)
+        shape = max((p.sample_shape(settings)[0] for p in parameters), key=len,
+                    default=(settings.get('sample_size', 1),))
+        values = np.empty((len(names),) + shape, dtype=dtype, order=order)
+
+        key = fingerprint(settings)
+        for slot, parameter in enumerate(parameters):
+            target = values[slot]
+            cached = parameter._cache_lookup(key)
+            if cached is not None:
+                # flat series of parameters without groups fill a single column of the groups axis
+                target[...] = magnitudes(cached).reshape(target.shape if target.ndim < 3 else target.shape[:2] + (-1,))
+                continue
+            for block in parameter.iter_blocks(settings, max_bytes=max_bytes):
+                index = (block.samples,) if block.months is None else (block.months, block.samples)
+                block_values = block.values
+                if block_values.ndim < target.ndim:
+                    block_values = block_values[..., np.newaxis]
+                target[index] = block_values
+        groupings = settings.get('groupings') if len(shape) == 3 else None
+        return SampleCube(values, names, settings.get('times') if settings.get('use_time_series') else None,
+                          groupings)
+
+    def iter_blocks(self, settings=None, names=None, scenario=ParameterScenarioSet.default_scenario, **kwargs):
+        """
+        Stream the samples of several parameters block by block, one parameter after the other.
+
+        :param settings: as for :meth:`Parameter.__call__`
+        :param names: names of the parameters, all parameters by default
+        :param scenario: the scenario, parameters without it use the default scenario
+        :param kwargs: block sizes, see :meth:`Parameter.iter_blocks`
+        :return: iterator of (parameter name, :class:`SampleBlock`)
+        """
+        for name in (names if names is not None else list(self.parameter_sets.keys())):
+            for block in self.get_parameter(name, scenario).iter_blocks(settings, **kwargs):
+                yield name, block
 
     def add_parameter(self, parameter: Parameter):
         """
@@ -612,6 +1056,10 @@ class ParameterRepository(object):
         for scenario in _scenarios:
             parameter.scenario = scenario
             self.parameter_sets[parameter.name][scenario] = parameter
+        if self.cache_manager is not None:
+            parameter.cache_manager = self.cache_manager
+        if self.disk_cache is not None:
+            parameter.disk_cache = self.disk_cache
 
         # record all tags for this parameter
         if parameter.tags:
@@ -645,8 +1093,9 @@ class ParameterRepository(object):
                 f'No default value for param {param.name} found.')
             return
         default = self.parameter_sets[param.name][ParameterScenarioSet.default_scenario]
-        for att_name, att_value in default.__dict__.items():
-            if att_name in ['unit', 'label', 'comment', 'source', 'tags']:
+        for att_name in ['unit', 'label', 'comment', 'source', 'tags']:
+            if hasattr(default, att_name):
+                att_value = getattr(default, att_name)
 
                 if att_name == 'tags' and default.tags != param.tags:
                     logger.warning(
@@ -0,0 +1,42 @@
+"""
+Blocks of samples for streaming generation.
+
+A block covers a range of months and a range of samples of the (months, samples[, groups]) cube of a parameter.
+Blocks are planned months first so that the cube can be processed chunk by chunk within a memory budget.
+"""
+from collections import namedtuple
+
+# months and samples are slices into the full cube, values is shaped (months, samples[, groups])
+# for distribution parameters without a time axis, months is None and values is shaped (samples,)
+SampleBlock = namedtuple('SampleBlock', ['months', 'samples', 'values'])
+
+
+def plan_blocks(months: int, size: int, width: int = 1, itemsize: int = 8, max_bytes: int = None,
+                months_per_block: int = None, samples_per_block: int = None):
+    """
+    Split a (months, size, width) cube into blocks.
+
+    Without explicit block sizes, blocks hold as many whole months as fit into `max_bytes`. If a single month does not
+    fit, each month is split into blocks of samples instead. Generating a block temporarily needs about twice its size.
+
+    :param months: number of months
+    :param size: number of samples
+    :param width: number of values per month and sample, e.g. the number of groups
+    :param itemsize: bytes per value
+    :param max_bytes: memory budget of a block
+    :param months_per_block: explicit number of months per block
+    :param samples_per_block: explicit number of samples per block
+    :return: list of (months, samples) slices in months first order
+    """
+    if months_per_block is None and samples_per_block is None and max_bytes is not None:
+        month_bytes = size * width * itemsize
+        if month_bytes <= max_bytes:
+            months_per_block = max(1, max_bytes // month_bytes)
+        else:
+            months_per_block = 1
+            samples_per_block = max(1, max_bytes // (width * itemsize))
+    months_per_block = months_per_block or months
+    samples_per_block = samples_per_block or size
+    return [(slice(m, min(m + months_per_block, months)), slice(s, min(s + samples_per_block, size)))
+            for m in range(0, months, months_per_block)
+            for s in range(0, size, samples_per_block)]
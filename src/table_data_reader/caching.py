@@ -0,0 +1,395 @@
+"""
+Caching of parameter samples.
+
+:func:`fingerprint` turns settings, including pandas indices and numpy arrays, into a canonical hashable value: equal
+settings give equal fingerprints, whatever the order of dict keys or the identity of the objects.
+
+:class:`CacheManager` bounds the memory held by the caches of many parameters. :class:`DiskCache` keeps seeded
+samples on disk across runs.
+"""
+import datetime
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from table_data_reader.diagnostics import NegativeValues
+from table_data_reader.results import SampleResult, magnitudes
+
+logger = logging.getLogger(__name__)
+
+# settings that do not change the samples
+IGNORED_SETTINGS = frozenset(['log_negative_values'])
+# settings that do not change the samples stored on disk
+DISK_IGNORED_SETTINGS = IGNORED_SETTINGS | {'lazy_result'}
+# changes whenever the layout of the disk cache or the generated samples change
+DISK_CACHE_VERSION = 1
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _content_digest(value) -> str:
+    # pandas hashes the values and the index of a series or frame row by row
+    return _digest(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+
+
+def canonical(value, strict=False):
+    """
+    A hashable canonical form of a (nested) value.
+
+    Containers, indices, arrays and pandas objects are reduced to their contents. Other hashable objects are kept as
+    they are, so they compare by their own equality. With `strict`, for keys that must be stable across processes,
+    only values with a content-based canonical form are accepted.
+
+    :raises TypeError: for values that cannot be canonicalised
+    """
+    if value is None or isinstance(value, (str, bytes, datetime.date, datetime.timedelta)):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool', bool(value)
+    if isinstance(value, (int, float, np.number)):
+        value = value.item() if isinstance(value, np.number) else value
+        # nan != nan, which would make equal settings miss the cache
+        return ('nan',) if value != value else value
+    if isinstance(value, dict):
+        return 'dict', tuple(sorted((str(k), canonical(v, strict)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return 'seq', tuple(canonical(v, strict) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return 'set', tuple(sorted(repr(canonical(v, strict)) for v in value))
+    if isinstance(value, pd.Index):
+        if isinstance(value, pd.DatetimeIndex):
+            data = value.asi8.tobytes()
+        else:
+            data = repr(value.tolist()).encode('utf-8')
+        return 'index', str(value.dtype), len(value), _digest(data)
+    if isinstance(value, pd.Series):
+        return 'series', str(value.dtype), canonical(value.name, strict), len(value), _content_digest(value)
+    if isinstance(value, pd.DataFrame):
+        return ('frame', canonical(list(value.columns), strict), tuple(str(dtype) for dtype in value.dtypes),
+                len(value), _content_digest(value))
+    if isinstance(value, np.ndarray):
+        return 'array', value.dtype.str, value.shape, _digest(np.ascontiguousarray(value).tobytes())
+    if isinstance(value, np.dtype) or isinstance(value, type) and issubclass(value, np.generic):
+        return 'dtype', str(np.dtype(value))
+    if strict:
+        qualname = getattr(value, '__qualname__', None)
+        if callable(value) and qualname and '<' not in qualname:
+            # named functions and classes, the repr of functions contains their address
+            return 'callable', getattr(value, '__module__', None), qualname
+        raise TypeError(f'Cannot canonicalise a value of type {type(value).__name__}')
+    try:
+        hash(value)
+    except TypeError:
+        raise TypeError(f'Cannot canonicalise a value of type {type(value).__name__}') from None
+    return 'object', value
+
+
+# canonical forms of immutable settings values by id, e.g. of the times index or of group_vars given as a tuple
+_immutable_canonicals = {}
+IMMUTABLE_CANONICALS_SIZE = 64
+_IMMUTABLE_SCALARS = (str, bytes, int, float, np.number, np.bool_, datetime.date, datetime.timedelta, type(None))
+
+
+def _immutable(value) -> bool:
+    if isinstance(value, (_IMMUTABLE_SCALARS, pd.Index)):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(_immutable(v) for v in value)
+    return False
+
+
+def _canonical_setting(value):
+    # values that cannot change in place are canonicalised once, all others on every call
+    if not isinstance(value, (tuple, frozenset, pd.Index)):
+        return canonical(value)
+    entry = _immutable_canonicals.get(id(value))
+    if entry is not None and entry[0] is value:
+        return entry[1]
+    result = canonical(value)
+    if _immutable(value):
+        if isinstance(value, (tuple, frozenset)) and len(value) > 8:
+            # a digest keeps the keys of the caches short to hash and compare
+            result = 'digest', _digest(repr(result).encode('utf-8'))
+        if len(_immutable_canonicals) >= IMMUTABLE_CANONICALS_SIZE:
+            _immutable_canonicals.clear()
+        # the value is kept with its canonical form, so that its id is not reused
+        _immutable_canonicals[id(value)] = (value, result)
+    return result
+
+
+def fingerprint(settings=None, args=(), kwargs=None):
+    """
+    The cache key of a call of a parameter with settings, args and kwargs.
+
+    The canonical forms of immutable settings values, such as the times index, are computed once. Lists, dicts and
+    arrays are canonicalised on every call, as they can change in place: pass long lists such as `group_vars` as
+    tuples to avoid hashing them again.
+    """
+    settings = tuple(sorted((str(k), _canonical_setting(v)) for k, v in (settings or {}).items()
+                            if k not in IGNORED_SETTINGS))
+    return 'seq', (('dict', settings), canonical(tuple(args)), canonical(kwargs or {}))
+
+
+def _array_nbytes(array: np.ndarray) -> int:
+    # views (e.g. the broadcast trend of sample_mean_value runs) hold at most the memory of the array they view
+    base = array
+    while isinstance(base.base, np.ndarray):
+        base = base.base
+    return min(array.nbytes, base.nbytes)
+
+
+def nbytes(value) -> int:
+    """
+    The memory held by a sampled value, not counting shared indices.
+    """
+    if isinstance(value, SampleResult):
+        size = _array_nbytes(value.array)
+        if value._series is not None:
+            size += int(value._series.memory_usage(index=False))
+        return size
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=False))
+    if isinstance(value, np.ndarray):
+        return _array_nbytes(value)
+    return np.asarray(value).nbytes
+
+
+class CacheManager(object):
+    """
+    Bounds the memory held by the cached samples of parameters.
+
+    Parameters that have a manager report every cached value, its size and the time it took to generate it. When the
+    cached values exceed `max_bytes`, values are evicted by GreedyDual-Size: each value has the priority
+    `clock + cost / bytes`, renewed on every hit, and the value with the lowest priority is evicted, advancing the clock
+    to its priority. Values that were used recently or that are expensive to regenerate per byte are kept longest; of
+    values with equal priorities, the least recently used is evicted.
+    A value that alone exceeds the budget is kept until the next value is cached.
+
+    :meth:`stats` reports the bytes held, hits, misses and evictions per parameter, :meth:`totals` over all parameters.
+    """
+    max_bytes: int
+
+    def __init__(self, max_bytes=None):
+        """
+        :param max_bytes: memory budget of all cached values, unbounded if None
+        """
+        self.max_bytes = max_bytes
+        # (parameter id, key) -> [parameter, key, bytes, cost, priority]
+        self._entries = {}
+        # (priority, parameter id, key) of every priority given out, outdated ones are skipped when popped
+        self._heap = []
+        self._bytes = 0
+        self._clock = 0.
+        self._tick = 0
+        # parameter id -> [parameter, hits, misses, evictions]
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _counters(self, parameter):
+        counters = self._stats.get(id(parameter))
+        if counters is None:
+            counters = self._stats[id(parameter)] = [parameter, 0, 0, 0]
+        return counters
+
+    def _prioritise(self, entry):
+        self._tick += 1
+        entry[4] = (self._clock + entry[3] / max(entry[2], 1), self._tick)
+        heapq.heappush(self._heap, (entry[4], id(entry[0]), entry[1]))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # drop the outdated priorities left behind by hits and removals
+            self._heap = [(entry[4], id(entry[0]), entry[1]) for entry in self._entries.values()]
+            heapq.heapify(self._heap)
+
+    def _pop_victim(self):
+        while True:
+            priority, parameter_id, key = heapq.heappop(self._heap)
+            entry = self._entries.get((parameter_id, key))
+            if entry is not None and entry[4] == priority:
+                return entry
+
+    def hit(self, parameter, key):
+        with self._lock:
+            self._counters(parameter)[1] += 1
+            entry = self._entries.get((id(parameter), key))
+            if entry is not None:
+                self._prioritise(entry)
+
+    def put(self, parameter, key, value, cost=0.):
+        """
+        Account for a newly cached value and evict others if the budget is exceeded.
+
+        :param cost: seconds it took to generate the value
+        """
+        size = nbytes(value)
+        with self._lock:
+            self._counters(parameter)[2] += 1
+            self._remove(id(parameter), key)
+            while self.max_bytes is not None and self._entries and self._bytes + size > self.max_bytes:
+                victim = self._pop_victim()
+                self._clock = victim[4][0]
+                self._remove(id(victim[0]), victim[1])
+                self._counters(victim[0])[3] += 1
+                victim[0]._cache_evict(victim[1])
+            entry = self._entries[(id(parameter), key)] = [parameter, key, size, cost, None]
+            self._prioritise(entry)
+            self._bytes += size
+
+    def discard(self, parameter, key=None, evicted=False):
+        """
+        Stop accounting for a value (all values of the parameter if key is None) that the parameter dropped.
+
+        :param evicted: count the value as evicted, e.g. by the parameter's own cache size
+        """
+        with self._lock:
+            keys = [key] if key is not None else [entry_key[1] for entry_key in self._entries
+                                                  if entry_key[0] == id(parameter)]
+            for key in keys:
+                if self._remove(id(parameter), key) and evicted:
+                    self._counters(parameter)[3] += 1
+
+    def _remove(self, parameter_id, key):
+        entry = self._entries.pop((parameter_id, key), None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry is not None
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> pd.DataFrame:
+        """
+        :return: DataFrame with columns name, scenario, entries, bytes, hits, misses and evictions, one row per
+            parameter
+        """
+        with self._lock:
+            held = defaultdict(lambda: [0, 0])
+            for (parameter_id, _), entry in self._entries.items():
+                held[parameter_id][0] += 1
+                held[parameter_id][1] += entry[2]
+            rows = [(parameter.name, parameter.scenario, *held[parameter_id], hits, misses, evictions)
+                    for parameter_id, (parameter, hits, misses, evictions) in self._stats.items()]
+        return pd.DataFrame(rows, columns=['name', 'scenario', 'entries', 'bytes', 'hits', 'misses', 'evictions'])
+
+    def totals(self) -> dict:
+        """
+        :return: dict of the entries, bytes, hits, misses and evictions of all parameters
+        """
+        stats = self.stats()
+        return {column: int(stats[column].sum()) for column in ['entries', 'bytes', 'hits', 'misses', 'evictions']}
+
+
+class DiskCache(object):
+    """
+    Keeps the samples of seeded runs as `.npy` files in a directory, so that later runs memory-map them instead of
+    sampling again.
+
+    Files are keyed by a digest of the parameter definition (all columns of its row, its name and scenario), the
+    settings including the seed, and the call arguments. Editing a row of the workbook changes the key, so stale
+    samples are never read; they stay on disk until :meth:`clear` is called. Runs without a seed are not cached.
+
+    Next to each `<key>.npy` a `<key>.json` file holds the metadata of the result and its negative values. It is
+    written last, so a key is only read once both files are complete.
+
+    Arrays are mapped copy-on-write by default: results read from disk can be changed in place like generated ones,
+    the changes stay in memory and never reach the files.
+    """
+    directory: str
+
+    def __init__(self, directory, mmap_mode='c'):
+        """
+        :param directory: directory of the files, created if missing
+        :param mmap_mode: how `np.load` maps the arrays, e.g. 'r' for read-only arrays or None to read them into
+            memory
+        """
+        self.directory = str(directory)
+        self.mmap_mode = mmap_mode
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def definition(parameter) -> dict:
+        """
+        The fields of a parameter that determine its samples.
+        """
+        # the resolved distribution and the parsed knots derive from other columns
+        kwargs = {k: v for k, v in parameter.kwargs.items() if k not in ('distribution', 'interp_knots')}
+        return dict(name=parameter.name, scenario=parameter.scenario, version=parameter.version, unit=parameter.unit,
+                    kwargs=kwargs)
+
+    def key(self, parameter, settings, args=(), kwargs=None) -> str:
+        """
+        :raises TypeError: if the settings or the definition hold values without a stable canonical form
+        """
+        settings = {k: v for k, v in settings.items() if k not in DISK_IGNORED_SETTINGS}
+        value = canonical((DISK_CACHE_VERSION, self.definition(parameter), settings, tuple(args), kwargs or {}),
+                          strict=True)
+        return hashlib.sha256(repr(value).encode('utf-8')).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def load(self, key, settings):
+        """
+        :return: (value, negative values) as a call with the settings returns them, or None if the key is not cached
+        """
+        try:
+            with open(self._path(key, 'json')) as f:
+                entry = json.load(f)
+            array = np.load(self._path(key, 'npy'), mmap_mode=self.mmap_mode)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable disk cache entry {key}: {e}')
+            return None
+        negative_values = entry['negative_values']
+        if negative_values is not None:
+            negative_values = NegativeValues(pd.Timestamp(negative_values[0]), negative_values[1])
+        metadata = entry['metadata']
+        if metadata is not None:
+            array = SampleResult(array, times=settings['times'], **metadata)
+        return self.as_called(array, settings), negative_values
+
+    @staticmethod
+    def as_called(value, settings):
+        """
+        A lazy result as a call with the settings returns it, i.e. as a series unless 'lazy_result' is set.
+        """
+        if isinstance(value, SampleResult) and not settings.get('lazy_result'):
+            return value.to_series()
+        return value
+
+    def store(self, key, value, negative_values):
+        """
+        Write a value, usually the lazy result of a generator, under a key.
+        """
+        metadata = None
+        if isinstance(value, SampleResult):
+            metadata = value.metadata()
+            del metadata['times']
+        if negative_values is not None:
+            negative_values = (negative_values.first_month.isoformat(), int(negative_values.count))
+        # write to temporary files and rename them, so that concurrent readers never see partial files
+        suffix = f'{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(self._path(key, suffix), 'wb') as f:
+            np.save(f, magnitudes(value))
+        os.replace(self._path(key, suffix), self._path(key, 'npy'))
+        with open(self._path(key, suffix), 'w') as f:
+            json.dump({'metadata': metadata, 'negative_values': negative_values}, f)
+        os.replace(self._path(key, suffix), self._path(key, 'json'))
+
+    def clear(self):
+        """
+        Remove all cached samples.
+        """
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(('.npy', '.json', '.tmp')):
+                os.remove(os.path.join(self.directory, file_name))
@@ -0,0 +1,31 @@
+"""
+Diagnostics of generated samples.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# the first month with values <= 0 and the total number of such values
+NegativeValues = namedtuple('NegativeValues', ['first_month', 'count'])
+
+
+def find_non_positive(values: np.ndarray, times: pd.DatetimeIndex, repeats: int = 1):
+    """
+    Find values <= 0 in generated samples without copying them.
+
+    The common case of no such values costs a single min reduction. Only months that do contain values <= 0 are
+    scanned further to count them.
+
+    :param values: array with the months on the first axis, e.g. (months, samples) or (months, samples, groups)
+    :param times: the months of the first axis
+    :param repeats: how often each value occurs in the samples, e.g. the sample size if `values` is the trend of a
+        `sample_mean_value` run
+    :return: :class:`NegativeValues` or None if all values are positive
+    """
+    if values.size == 0 or not values.min() <= 0:
+        return None
+    rows = values.reshape(len(times), -1)
+    offending = np.flatnonzero(rows.min(axis=1) <= 0)
+    count = sum(int(np.count_nonzero(rows[month] <= 0)) for month in offending)
+    return NegativeValues(times[offending[0]], count * repeats)
@@ -0,0 +1,185 @@
+"""
+Registry of the distribution functions that parameters sample from.
+
+Distributions are resolved when parameters are defined: the function is looked up once per (module, distribution) and
+the parameters are parsed once per parameter, so that unknown distributions are reported while loading a table rather
+than at the first sample, and sampling reuses the resolved function.
+
+The registry also holds the analytic means that `sample_mean_value` runs use instead of sampling.
+"""
+import importlib
+import math
+from collections import namedtuple
+
+import numpy as np
+from scipy import special
+
+
+class ResolvedDistribution(namedtuple('ResolvedDistribution',
+                                      ['module_name', 'distribution_name', 'function', 'params'])):
+    """
+    The function and the parsed positional parameters of a distribution.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        # pickle by name: numpy.random functions are bound to the global RandomState and would drag it along
+        return _unpickle_distribution, (self.module_name, self.distribution_name, self.params)
+
+
+def _unpickle_distribution(module_name, distribution_name, params):
+    return ResolvedDistribution(module_name, distribution_name,
+                                distribution_registry.function(module_name, distribution_name), params)
+
+
+class UnknownDistributionError(ValueError):
+    pass
+
+
+def parse_distribution_params(distribution_name, param_a=None, param_b=None, param_c=None) -> list:
+    """
+    The positional parameters of a distribution from the param_a, param_b and param_c columns.
+
+    The values of the choice distribution are either given as a comma-separated string in param_a or in the three
+    columns. They are passed as one float array.
+    """
+    if distribution_name == 'choice':
+        if type(param_a) is str:
+            params = [float(token.strip()) for token in param_a.split(',')]
+        else:
+            params = [i for i in [param_a, param_b, param_c] if i]
+        return [np.array(params, dtype=np.float64)]
+    return [i for i in [param_a, param_b, param_c] if i not in [None, ""]]
+
+
+def _randint_mean(low, high=None):
+    # samples from [0, low) if high is not given, from [low, high) otherwise
+    return (low - 1) / 2. if high is None else (low + high - 1) / 2.
+
+
+def _pareto_mean(a):
+    # numpy's pareto is the Lomax (pareto II) distribution
+    return 1. / (a - 1) if a > 1 else np.inf
+
+
+def _zipf_mean(a):
+    return special.zeta(a - 1) / special.zeta(a) if a > 2 else np.inf
+
+
+# means of the numpy.random distributions with numpy's parameter order and defaults
+NUMPY_MEANS = {
+    'normal': lambda loc=0., scale=1.: loc,
+    'uniform': lambda low=0., high=1.: (low + high) / 2.,
+    'triangular': lambda left, mode, right: (left + mode + right) / 3.,
+    'choice': lambda a, *args: np.mean(a) if np.ndim(a) else (a - 1) / 2.,
+    'lognormal': lambda mean=0., sigma=1.: math.exp(mean + sigma ** 2 / 2.),
+    'gamma': lambda shape, scale=1.: shape * scale,
+    'beta': lambda a, b: a / (a + b),
+    'exponential': lambda scale=1.: scale,
+    'poisson': lambda lam=1.: lam,
+    'binomial': lambda n, p: n * p,
+    'negative_binomial': lambda n, p: n * (1 - p) / p,
+    'geometric': lambda p: 1. / p,
+    'hypergeometric': lambda ngood, nbad, nsample: nsample * ngood / (ngood + nbad),
+    'logseries': lambda p: -p / ((1 - p) * math.log(1 - p)),
+    'weibull': lambda a: math.gamma(1 + 1. / a),
+    'pareto': _pareto_mean,
+    'zipf': _zipf_mean,
+    'power': lambda a: a / (a + 1.),
+    'laplace': lambda loc=0., scale=1.: loc,
+    'logistic': lambda loc=0., scale=1.: loc,
+    'gumbel': lambda loc=0., scale=1.: loc + scale * np.euler_gamma,
+    'rayleigh': lambda scale=1.: scale * math.sqrt(math.pi / 2),
+    'wald': lambda mean, scale: mean,
+    'vonmises': lambda mu, kappa: mu,
+    'chisquare': lambda df: df,
+    'noncentral_chisquare': lambda df, nonc: df + nonc,
+    'f': lambda dfnum, dfden: dfden / (dfden - 2.) if dfden > 2 else np.inf,
+    'noncentral_f': lambda dfnum, dfden, nonc: dfden * (dfnum + nonc) / (dfnum * (dfden - 2.)) if dfden > 2 else np.inf,
+    'standard_t': lambda df: 0. if df > 1 else np.nan,
+    'standard_normal': lambda: 0.,
+    'standard_exponential': lambda: 1.,
+    'standard_gamma': lambda shape: shape,
+    'standard_cauchy': lambda: np.nan,
+    'random': lambda: .5,
+    'random_sample': lambda: .5,
+    'rand': lambda *args: .5,
+    'randint': _randint_mean,
+    'integers': _randint_mean,
+}
+
+
+class DistributionRegistry(object):
+    """
+    Resolves (module, distribution) names to functions, importing each module once.
+
+    Custom distributions can be registered under any module name, e.g.
+    `distribution_registry.register('my.module', 'pert', pert, mean=pert_mean)`.
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self.means = {('numpy.random', name): mean for name, mean in NUMPY_MEANS.items()}
+
+    def register(self, module_name, distribution_name, function, mean=None):
+        """
+        Register a custom distribution function and optionally its mean.
+
+        :param function: called as `function(*params, size=size)`
+        :param mean: called as `mean(*params)`
+        """
+        self.functions[(module_name, distribution_name)] = function
+        if mean is not None:
+            self.register_mean(module_name, distribution_name, mean)
+
+    def register_mean(self, module_name, distribution_name, mean):
+        self.means[(module_name, distribution_name)] = mean
+
+    def mean(self, module_name, distribution_name, params):
+        """
+        The analytic mean of a distribution, without sampling.
+
+        scipy.stats distributions use their `mean` method, all others a registered mean function.
+
+        :raises ValueError: if no mean is known for the distribution
+        """
+        mean = self.means.get((module_name, distribution_name))
+        if mean is None and module_name == 'scipy.stats':
+            mean = getattr(self.function(module_name, distribution_name), 'mean', None)
+        if mean is None:
+            raise ValueError(f'No analytic mean for distribution {distribution_name} in module {module_name}, '
+                             f'register one with distribution_registry.register_mean')
+        return mean(*params)
+
+    def function(self, module_name, distribution_name):
+        """
+        The distribution function, imported on first use.
+
+        :raises UnknownDistributionError: if the module or the distribution does not exist
+        """
+        key = (module_name, distribution_name)
+        function = self.functions.get(key)
+        if function is None:
+            try:
+                module = importlib.import_module(module_name)
+            except (ImportError, TypeError, ValueError) as e:
+                raise UnknownDistributionError(f'Unknown distribution module {module_name}') from e
+            function = getattr(module, distribution_name, None)
+            if not callable(function):
+                raise UnknownDistributionError(f'Unknown distribution {distribution_name} in module {module_name}')
+            self.functions[key] = function
+        return function
+
+    def resolve(self, module_name, distribution_name, param_a=None, param_b=None,
+                param_c=None) -> ResolvedDistribution:
+        """
+        Look up the function of a distribution and parse its parameters.
+
+        :raises UnknownDistributionError: if the module or the distribution does not exist
+        """
+        return ResolvedDistribution(module_name, distribution_name, self.function(module_name, distribution_name),
+                                    parse_distribution_params(distribution_name, param_a, param_b, param_c))
+
+
+# the registry used by parameters and generators
+distribution_registry = DistributionRegistry()
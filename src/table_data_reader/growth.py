@@ -0,0 +1,106 @@
+"""
+Growth factors for the time series generators.
+
+Growth is applied per month relative to a ref date according to the CAGR formula:
+months after the ref date are scaled by (1 + alpha)^(k/12), months before it by (1 - alpha)^(k/12),
+with k the number of months between the ref date and the month.
+
+The factors only depend on the month, never on the sample, so they are returned as vectors over the
+month axis that callers broadcast against the sample axis.
+"""
+from functools import lru_cache
+
+import numpy as np
+from dateutil import relativedelta as rdelta
+
+from table_data_reader.time_axis import MonthAxis
+
+# number of distinct (time axis, ref date, alpha) growth vectors kept by cached_growth_vector
+GROWTH_CACHE_SIZE = 4096
+
+
+def _months_between(later, earlier):
+    delta = rdelta.relativedelta(later, earlier)
+    return delta.months + 12 * delta.years
+
+
+def _growth(k, alpha):
+    # closed form over signed month offsets k, alpha broadcasts against k
+    base = np.where(k < 0, 1 - alpha, 1 + alpha)
+    return np.power(base, np.abs(k) / 12)
+
+
+def month_offsets(start_date, end_date, ref_date):
+    """
+    Signed month offsets from the ref date for every month from start date to end date (inclusive).
+
+    Months before the ref date have negative offsets.
+
+    :return: 1-D int array with one entry per month
+    """
+    months = _months_between(end_date, start_date) + 1
+    if ref_date <= start_date:
+        first = _months_between(start_date, ref_date)
+    else:
+        first = -_months_between(ref_date, start_date)
+    return first + np.arange(months)
+
+
+def growth_vector(start_date, end_date, ref_date, alpha, dtype=np.float64):
+    """
+    Build a vector of growth factors according to the CAGR formula  y'=y0 (1+a)^(t'-t0).
+
+    a growth rate alpha
+    t0 ref date
+    t' each month from start date to end date
+    y' output
+    y0 ref value
+
+    :return: 1-D array of growth factors with one entry per month
+    """
+    return _growth(month_offsets(start_date, end_date, ref_date), alpha).astype(dtype, copy=False)
+
+
+@lru_cache(maxsize=GROWTH_CACHE_SIZE)
+def cached_growth_vector(axis: MonthAxis, ref_date, alpha, dtype=np.float64):
+    """
+    Memoised growth vector over a :class:`MonthAxis`, shared by all parameters.
+
+    Many parameters share the same ref date and growth rates, so the vectors are computed once per
+    (time axis, ref date, alpha, dtype). The returned array is shared between callers and therefore read-only.
+    Reuse can be monitored with `cached_growth_vector.cache_info()` (hits, misses, maxsize, currsize)
+    and the cache emptied with `cached_growth_vector.cache_clear()`.
+
+    :return: read-only 1-D array of growth factors with one entry per month of the axis
+    """
+    vector = _growth(axis.offsets_from(ref_date), alpha).astype(dtype, copy=False)
+    vector.setflags(write=False)
+    return vector
+
+
+def growth_matrix(axis: MonthAxis, ref_dates, alphas, dtype=np.float64):
+    """
+    Batched :func:`cached_growth_vector` for many parameters (or groups) at once.
+
+    All ref dates are placed on the axis together with :meth:`MonthAxis.offsets_from`, so there is no
+    per-parameter datetime work.
+
+    :param ref_dates: a ref date or a sequence of ref dates, one per column
+    :param alphas: a growth rate or a sequence of growth rates, one per column
+    :param dtype: float dtype of the result
+    :return: array of shape (months, n) with the growth vector of parameter i in column i
+    """
+    ref_dates, alphas = np.broadcast_arrays(np.atleast_1d(np.asarray(ref_dates, dtype='datetime64[us]')),
+                                            np.atleast_1d(np.asarray(alphas, dtype=float)))
+    return _growth(axis.offsets_from(ref_dates), alphas).astype(dtype, copy=False)
+
+
+def growth_coefficients(start_date, end_date, ref_date, alpha, samples):
+    """
+    Build a matrix of growth factors according to the CAGR formula  y'=y0 (1+a)^(t'-t0).
+
+    Every column is identical. Prefer :func:`growth_vector` and broadcast against the sample axis instead.
+
+    :return: array of shape (months, samples)
+    """
+    return np.repeat(growth_vector(start_date, end_date, ref_date, alpha)[:, np.newaxis], samples, axis=1)
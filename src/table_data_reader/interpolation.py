@@ -0,0 +1,44 @@
+"""
+Interpolation of 'interp' type variables.
+
+The ref value of an interp variable is a json object of {"YYYY-MM-DD": value} knots. The knots are parsed once
+into numeric arrays (dates as seconds since epoch) and evaluated over the seconds of a :class:`MonthAxis`.
+"""
+import json
+
+import numpy as np
+
+
+def parse_interp_knots(ref_value):
+    """
+    Parse the json knots of an interp variable.
+
+    :param ref_value: json string of {"YYYY-MM-DD": value}, or a dict of group name to json string
+    :return: tuple (seconds, values) of arrays sorted by date, or a dict of group name to such tuples
+    """
+    if isinstance(ref_value, dict):
+        return {group: parse_interp_knots(value) for group, value in ref_value.items()}
+
+    knots = json.loads(ref_value.strip())
+    seconds = np.array([np.datetime64(date_val, 's') for date_val in knots.keys()]).astype(np.int64)
+    values = np.array([float(value) for value in knots.values()])
+    order = np.argsort(seconds, kind='stable')
+    return seconds[order], values[order]
+
+
+def linear_interpolation(x, xp, fp):
+    """
+    Linear interpolation between the knots (xp, fp), extrapolating linearly from the first and last segment.
+
+    :param x: points to evaluate
+    :param xp: sorted knot positions
+    :param fp: knot values
+    :return: array of interpolated values
+    """
+    y = np.interp(x, xp, fp)
+    if len(xp) > 1:
+        before = x < xp[0]
+        y[before] = fp[0] + (x[before] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+        after = x > xp[-1]
+        y[after] = fp[-1] + (x[after] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    return y
@@ -0,0 +1,144 @@
+"""
+Sampling many parameters in parallel.
+
+Workers of a process pool write the samples straight into one `multiprocessing.shared_memory` block that the parent
+allocated for all parameters, so large arrays are never pickled. Only the parameter definitions go to the workers and
+only small metadata comes back.
+
+A thread pool avoids these copies and the start-up of processes. It scales as far as the large NumPy operations of
+the generators release the GIL. Every parameter draws from its own seeded stream, so results do not depend on the
+thread that sampled it.
+"""
+import copy
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from table_data_reader.results import SampleResult
+
+logger = logging.getLogger(__name__)
+
+# offsets of the parameters in the shared block are aligned to cache lines
+ALIGNMENT = 64
+
+
+def _aligned(nbytes):
+    return -(-nbytes // ALIGNMENT) * ALIGNMENT
+
+
+def _sample_batch(shm_name, settings, batch):
+    """
+    Sample a batch of parameters in a worker and write the values into the shared block.
+
+    :return: list of (negative values, SampleResult metadata or None) per parameter
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = []
+        for parameter, offset, shape, dtype in batch:
+            result = parameter({**settings, 'lazy_result': True})
+            target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            target[...] = result.array if isinstance(result, SampleResult) else result
+            del target
+            metadata = None
+            if isinstance(result, SampleResult):
+                # the parent has the times already
+                metadata = result.metadata()
+                del metadata['times']
+            out.append((parameter.negative_values, metadata))
+        return out
+    finally:
+        shm.close()
+
+
+def _seeded(settings):
+    # forked workers or concurrent threads must not share the global numpy.random state
+    if settings.get('seed') is None:
+        settings = {**settings, 'seed': int(np.random.randint(2 ** 31))}
+        logger.info(f"Sampling in parallel with seed {settings['seed']} drawn from numpy.random")
+    return settings
+
+
+def sample_in_threads(parameters, settings, max_workers=None):
+    """
+    Sample parameters in a thread pool.
+
+    Without a seed in the settings, a root seed is drawn from the global numpy.random state first. The values are
+    not cached by the parameters, the caller caches them under its own settings.
+
+    :param parameters: dict of name to :class:`Parameter`
+    :param settings: as for :meth:`Parameter.__call__`
+    :param max_workers: number of threads, by default the number of CPUs
+    :return: dict of name to (value, negative values)
+    """
+    settings = _seeded(settings)
+    names = list(parameters.keys())
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        values = executor.map(lambda name: parameters[name]._generate(settings, (), {}), names)
+        return dict(zip(names, values))
+
+
+def sample_in_processes(parameters, settings, max_workers=None, tasks_per_worker=4):
+    """
+    Sample parameters in a process pool.
+
+    Without a seed in the settings, a root seed is drawn from the global numpy.random state first. Workers are forked
+    copies of the global state and would otherwise draw the same numbers.
+
+    :param parameters: dict of name to :class:`Parameter` without cached values
+    :param settings: as for :meth:`Parameter.__call__`
+    :param max_workers: number of worker processes, by default the number of CPUs
+    :param tasks_per_worker: parameters are sent in batches, about this many per worker
+    :return: dict of name to (value, negative values) where value is what :meth:`Parameter.__call__` returns
+    """
+    settings = _seeded(settings)
+    names = list(parameters.keys())
+    layout = {}
+    nbytes = 0
+    for name in names:
+        shape, dtype = parameters[name].sample_shape(settings)
+        layout[name] = (nbytes, shape, dtype)
+        nbytes += _aligned(int(np.prod(shape)) * dtype.itemsize)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            batches = np.array_split(np.arange(len(names)), max(1, min(len(names), max_workers * tasks_per_worker)))
+            futures = []
+            for batch in batches:
+                tasks = []
+                for i in batch:
+                    # send the definition only, never cached values
+                    parameter = copy.copy(parameters[names[i]])
+                    parameter.clear_cache()
+                    tasks.append((parameter,) + layout[names[i]])
+                futures.append((batch, executor.submit(_sample_batch, shm.name, settings, tasks)))
+            returned = {}
+            for batch, future in futures:
+                for i, metadata in zip(batch, future.result()):
+                    returned[names[i]] = metadata
+
+        # copy every parameter out on its own, so each result can be freed independently of the others
+        arrays = {}
+        for name in names:
+            offset, shape, dtype = layout[name]
+            arrays[name] = np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = {}
+    for name in names:
+        array = arrays[name]
+        negative_values, metadata = returned[name]
+        if metadata is None:
+            value = array
+        else:
+            result = SampleResult(array, times=settings['times'], **metadata)
+            value = result if settings.get('lazy_result') else result.to_series()
+        results[name] = (value, negative_values)
+    return results
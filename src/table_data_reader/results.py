@@ -0,0 +1,256 @@
+"""
+Results of the time series generators.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import pint_pandas
+
+from table_data_reader.time_axis import MonthAxis, month_axis
+
+# total size in bytes of the indices kept by sample_index, least recently used indices are dropped first
+INDEX_CACHE_BYTES = 64 * 2 ** 20
+
+IndexCacheInfo = namedtuple('IndexCacheInfo', ['hits', 'misses', 'maxbytes', 'currbytes', 'currsize'])
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+_index_cache_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+
+def _sample_index(axis, size, groupings, names):
+    key = (axis, size, groupings, names)
+    with _index_cache_lock:
+        entry = _index_cache.get(key)
+        if entry is not None:
+            _index_cache.move_to_end(key)
+            _index_cache_stats['hits'] += 1
+            return entry[0]
+        _index_cache_stats['misses'] += 1
+
+    iterables = [axis.times, range(size)]
+    if groupings:
+        iterables.append(list(groupings))
+    index = pd.MultiIndex.from_product(iterables, names=list(names))
+
+    size_bytes = index.nbytes
+    with _index_cache_lock:
+        if key not in _index_cache and size_bytes <= INDEX_CACHE_BYTES:
+            while _index_cache and _index_cache_stats['bytes'] + size_bytes > INDEX_CACHE_BYTES:
+                _, (_, evicted_bytes) = _index_cache.popitem(last=False)
+                _index_cache_stats['bytes'] -= evicted_bytes
+            _index_cache[key] = (index, size_bytes)
+            _index_cache_stats['bytes'] += size_bytes
+    return index
+
+
+def _index_cache_info():
+    with _index_cache_lock:
+        return IndexCacheInfo(_index_cache_stats['hits'], _index_cache_stats['misses'], INDEX_CACHE_BYTES,
+                              _index_cache_stats['bytes'], len(_index_cache))
+
+
+def _index_cache_clear():
+    with _index_cache_lock:
+        _index_cache.clear()
+        _index_cache_stats.update(hits=0, misses=0, bytes=0)
+
+
+def sample_index(axis: MonthAxis, size: int, groupings=None, names=None) -> pd.MultiIndex:
+    """
+    The (time, samples[, group]) MultiIndex of generated series.
+
+    Every parameter sampled with the same settings has the same index, so indices are cached and all series of a
+    run share their levels and codes. Each call returns a shallow copy, because the names of an index can be changed
+    in place and renaming the index of one series must not rename the others. The cache holds at most
+    `INDEX_CACHE_BYTES` of indices, reuse can be monitored with `sample_index.cache_info()` and the cache emptied
+    with `sample_index.cache_clear()`.
+
+    :param axis: the month axis of the time index
+    :param size: the sample size
+    :param groupings: optional group names
+    :param names: index level names, by default 'time', 'samples' and 'group'
+    :return:
+    """
+    groupings = tuple(groupings) if groupings else None
+    if names is None:
+        names = ('time', 'samples', 'group') if groupings else ('time', 'samples')
+    return _sample_index(axis, size, groupings, tuple(names)).copy()
+
+
+sample_index.cache_info = _index_cache_info
+sample_index.cache_clear = _index_cache_clear
+
+
+def build_series(values, index, dtype, unit=None, with_pint_units=False) -> pd.Series:
+    """
+    Wrap generated values into a Series of the requested float dtype, optionally as pint quantities.
+
+    :param values: flat array (or sequence) of values in index order
+    :param index: the index of the series
+    :param dtype: numpy float dtype of the values (or of the pint magnitudes)
+    :param unit: pint unit, 'dimensionless' if empty
+    :param with_pint_units:
+    :return:
+    """
+    if with_pint_units:
+        unit = unit if unit else 'dimensionless'
+        if np.dtype(dtype) == np.float64:
+            return pd.Series(values, index=index, dtype=f'pint[{unit}]')
+        return pd.Series(pint_pandas.PintArray(np.asarray(values, dtype=dtype), dtype=unit), index=index)
+    return pd.Series(values, index=index, dtype=dtype)
+
+
+class SampleResult(object):
+    """
+    The samples of a time series parameter as a raw ndarray plus the metadata of its axes.
+
+    The MultiIndex Series the generators return by default is only built when pandas behaviour is used:
+    attribute access and operators are forwarded to :meth:`to_series`. NumPy based consumers use :attr:`array`,
+    shaped (months, samples) or (months, samples, groups), or the flat :attr:`values` without paying for the index.
+
+    For `sample_mean_value` runs :attr:`array` is a read-only view of the trend broadcast over the samples. It is
+    materialised when flat values or the series are needed, or when :meth:`writable_array` is called.
+    """
+    # let pandas defer binary operations with a SampleResult to the reflected operators below
+    __pandas_priority__ = 5000
+
+    array: np.ndarray
+    times: pd.DatetimeIndex
+    size: int
+
+    def __init__(self, array: np.ndarray, times: pd.DatetimeIndex, size: int, groupings=None, unit: str = None,
+                 with_pint_units=False, index: pd.MultiIndex = None, index_names=None):
+        """
+        :param array: values shaped (months, samples) or (months, samples, groups)
+        :param index: optional prebuilt index, by default the shared :func:`sample_index` of times, samples and
+            groupings, looked up on demand
+        :param index_names: optional level names of the default index
+        """
+        self.array = array
+        self.times = times
+        self.size = size
+        self.groupings = list(groupings) if groupings else None
+        self.unit = unit
+        self.with_pint_units = with_pint_units
+        self._index = index
+        self.index_names = index_names
+        self._series = None
+
+    @property
+    def index(self) -> pd.MultiIndex:
+        if self._index is None:
+            self._index = sample_index(month_axis(self.times), self.size, self.groupings, self.index_names)
+        return self._index
+
+    @property
+    def values(self):
+        """
+        The flat values in index order, like `Series.values`. Pint results return the materialised PintArray.
+        """
+        if self.with_pint_units:
+            return self.to_series().values
+        return self._flat()
+
+    def _flat(self):
+        # a broadcast view has no flat view, so copy it once rather than on every access
+        if not self.array.flags.c_contiguous:
+            self.array = np.ascontiguousarray(self.array)
+        return self.array.reshape(-1)
+
+    def metadata(self) -> dict:
+        """
+        The arguments to rebuild this result around another array, e.g. one in shared memory.
+        """
+        return dict(times=self.times, size=self.size, groupings=self.groupings, unit=self.unit,
+                    with_pint_units=self.with_pint_units, index_names=self.index_names)
+
+    def writable_array(self) -> np.ndarray:
+        """
+        :attr:`array` as a writable array, materialising a read-only view once.
+        """
+        if not self.array.flags.writeable:
+            self.array = np.array(self.array)
+        return self.array
+
+    def to_series(self) -> pd.Series:
+        """
+        Materialise (once) the MultiIndex Series that the generators return by default.
+        """
+        if self._series is None:
+            self._series = build_series(self._flat(), self.index, self.array.dtype, self.unit,
+                                        self.with_pint_units)
+        return self._series
+
+    def __array__(self, dtype=None, copy=None):
+        values = np.asarray(self.to_series()) if self.with_pint_units else self._flat()
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def __len__(self):
+        return self.array.size
+
+    def __repr__(self):
+        return repr(self.to_series())
+
+    def __getattr__(self, item):
+        # only called for attributes not defined above - fall back to pandas behaviour
+        if item.startswith('__') or item in ('_series', '_index'):
+            raise AttributeError(item)
+        return getattr(self.to_series(), item)
+
+
+def _forward(name):
+    def method(self, *args):
+        args = [arg.to_series() if isinstance(arg, SampleResult) else arg for arg in args]
+        return getattr(self.to_series(), name)(*args)
+
+    method.__name__ = name
+    return method
+
+
+for _name in ['__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__', '__truediv__', '__rtruediv__',
+              '__floordiv__', '__rfloordiv__', '__pow__', '__rpow__', '__neg__', '__abs__',
+              '__lt__', '__le__', '__gt__', '__ge__', '__eq__', '__ne__', '__getitem__', '__iter__']:
+    setattr(SampleResult, _name, _forward(_name))
+
+
+def magnitudes(value) -> np.ndarray:
+    """
+    The plain values of a sampled parameter as an ndarray: the :attr:`SampleResult.array`, the magnitudes of a pint
+    series or the values of a series or array.
+    """
+    if isinstance(value, SampleResult):
+        return value.array
+    if isinstance(value, pd.Series) and isinstance(value.dtype, pint_pandas.PintType):
+        return np.asarray(value.pint.magnitude)
+    return np.asarray(value)
+
+
+class SampleCube(object):
+    """
+    The samples of several parameters in one dense array, shaped (params, months, samples[, groups]) for time series
+    and (params, samples) otherwise.
+
+    Parameters without groups are repeated over the groups of the cube. :attr:`slots` maps parameter names to their
+    position on the first axis, indexing the cube with a name returns the values of that parameter.
+    """
+    values: np.ndarray
+    slots: dict
+
+    def __init__(self, values: np.ndarray, names, times: pd.DatetimeIndex = None, groupings=None):
+        self.values = values
+        self.names = list(names)
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+        self.times = times
+        self.groupings = list(groupings) if groupings else None
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.values[self.slots[name]]
+
+    def __contains__(self, name):
+        return name in self.slots
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,219 @@
+"""
+Random number streams for sampling parameters.
+
+With a root seed, every (parameter, scenario, group) gets its own `np.random.Generator` stream derived with
+`np.random.SeedSequence`. The streams depend only on the seed and the key, never on the order in which parameters
+are sampled, so results are identical whether parameters are sampled serially, in threads or in worker processes.
+
+The sampling mode selects how uniform numbers are placed over the samples: independently ('mc'), stratified by a
+latin hypercube ('lhs') or as a scrambled Sobol' sequence ('sobol'). Stratified uniforms are mapped to the
+distributions through their inverse CDFs.
+"""
+import hashlib
+import logging
+import warnings
+
+import numpy as np
+from scipy import stats
+from scipy.stats import qmc
+
+logger = logging.getLogger(__name__)
+
+MC = 'mc'
+LHS = 'lhs'
+SOBOL = 'sobol'
+SAMPLING_MODES = (MC, LHS, SOBOL)
+# scipy's Sobol' direction numbers cover this many dimensions, i.e. months x groups of a parameter
+SOBOL_MAX_DIMENSIONS = getattr(qmc.Sobol, 'MAXDIM', 21201)
+
+
+def _stable_key(value) -> int:
+    # python's hash() of strings is salted per process, so derive the key from a digest instead
+    return int.from_bytes(hashlib.sha256(str(value).encode('utf-8')).digest()[:8], 'little')
+
+
+class RandomStreams(object):
+    """
+    The random streams of one parameter, derived from a root seed.
+    """
+    seed: int
+    name: str
+    scenario: str
+
+    def __init__(self, seed, name, scenario=None):
+        self.seed = seed
+        self.name = name
+        self.scenario = scenario
+
+    def seed_sequence(self, group=None) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.seed, spawn_key=(_stable_key(self.name), _stable_key(self.scenario),
+                                                            _stable_key(group)))
+
+    def generator(self, group=None) -> np.random.Generator:
+        """
+        A new generator positioned at the start of the stream of this parameter (and group).
+
+        :param group: optional group of a group variable
+        :return:
+        """
+        return np.random.Generator(np.random.PCG64(self.seed_sequence(group)))
+
+
+# numpy.random functions whose Generator equivalent has another name
+GENERATOR_NAMES = {
+    'randint': 'integers',
+    'random_sample': 'random',
+    'ranf': 'random',
+    'sample': 'random',
+}
+
+# warnings that are only logged once per process
+_logged_warnings = set()
+
+
+def _warn_once(key, message):
+    if key not in _logged_warnings:
+        _logged_warnings.add(key)
+        logger.warning(message)
+
+
+def generator_function(generator: np.random.Generator, distribution_name):
+    """
+    The numpy.random distribution function that draws from the stream of a generator.
+
+    Legacy names are mapped to their Generator equivalents. Functions that only the legacy `RandomState` has draw
+    from a `RandomState` seeded from the same stream.
+    """
+    function = getattr(generator, GENERATOR_NAMES.get(distribution_name, distribution_name), None)
+    if function is None:
+        random_state = np.random.RandomState(np.random.MT19937(generator.bit_generator.seed_seq))
+        function = getattr(random_state, distribution_name)
+    return function
+
+
+def warn_unseeded(module_name, distribution_name):
+    """
+    Warn once that a distribution cannot draw from the random streams of a seed.
+    """
+    _warn_once(('unseeded', module_name, distribution_name),
+               f'{module_name}.{distribution_name} draws from the global numpy.random state, seeded results are not '
+               f'reproducible across threads and processes')
+
+
+def _engine_seed(random_state):
+    # qmc engines take a Generator; without streams draw their seed from the global numpy.random state
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    return random_state.randint(2 ** 31)
+
+
+def stratified_uniform(shape, mode, random_state, axis=-1) -> np.ndarray:
+    """
+    Uniform numbers in [0, 1) that are stratified over the samples.
+
+    The samples lie along `axis`; every position on the other axes (e.g. every month and group) is a dimension of
+    the latin hypercube or Sobol' sequence, so each of them is stratified independently.
+
+    Sobol' sequences are balanced for sample sizes that are powers of two; other sizes still work, but a warning is
+    logged once. Beyond :data:`SOBOL_MAX_DIMENSIONS` dimensions, e.g. many months times many groups, the latin
+    hypercube is used instead.
+
+    :param shape: shape of the result
+    :param mode: 'lhs' or 'sobol'
+    :param random_state: `np.random.Generator` or the `numpy.random` module to seed the scrambling
+    :param axis: the samples axis
+    :return: C-ordered array of the given shape
+    """
+    shape = tuple(shape)
+    axis = axis % len(shape)
+    n = shape[axis]
+    dimensions = shape[:axis] + shape[axis + 1:]
+    d = int(np.prod(dimensions, dtype=np.int64))
+    if mode == SOBOL and d > SOBOL_MAX_DIMENSIONS:
+        _warn_once(('sobol dimensions', d), f"Sobol' sequences support at most {SOBOL_MAX_DIMENSIONS} dimensions, "
+                                            f"got {d} (months x groups), falling back to {LHS} sampling")
+        mode = LHS
+    if mode == LHS:
+        engine = qmc.LatinHypercube(d, seed=_engine_seed(random_state))
+    elif mode == SOBOL:
+        if n & (n - 1):
+            _warn_once(('sobol size', n), f"The sample size {n} is not a power of two, Sobol' samples are not "
+                                          f"balanced")
+        engine = qmc.Sobol(d, seed=_engine_seed(random_state))
+    else:
+        raise ValueError(f'Unknown stratified sampling mode {mode}, expected one of {SAMPLING_MODES[1:]}')
+    with warnings.catch_warnings():
+        # scipy warns about unbalanced Sobol' samples on every call, logged once above
+        warnings.filterwarnings('ignore', message='The balance properties', category=UserWarning)
+        u = engine.random(n).reshape((n,) + dimensions)
+    return np.ascontiguousarray(np.moveaxis(u, 0, axis))
+
+
+def unit_triangular_ppf(u):
+    """
+    Inverse CDF of the symmetric unit triangular distribution, `triangular(-1, 0, 1)`
+    """
+    return np.where(u < 0.5, np.sqrt(2 * u) - 1, 1 - np.sqrt(2 * (1 - u)))
+
+
+def unit_triangular_block(generator: np.random.Generator, shape, months: slice, samples: slice) -> np.ndarray:
+    """
+    The block `[months, samples]` of `generator.triangular(-1, 0, 1, shape)` without drawing the rest of the array.
+
+    Every triangular value consumes exactly one output of the bit generator, so the stream is advanced to the start of
+    the block (of each month, if the block does not span all samples) instead of drawing the skipped values.
+
+    :param generator: generator positioned at the start of the stream
+    :param shape: (months, samples) or (months, samples, groups) of the full array
+    :return:
+    """
+    size, rest = shape[1], tuple(shape[2:])
+    width = int(np.prod(rest, dtype=np.int64))
+    m0, m1, _ = months.indices(shape[0])
+    s0, s1, _ = samples.indices(size)
+    bit_generator = generator.bit_generator
+    if s0 == 0 and s1 == size:
+        bit_generator.advance(m0 * size * width)
+        return generator.triangular(-1, 0, 1, (m1 - m0, size) + rest)
+
+    block = np.empty((m1 - m0, s1 - s0) + rest)
+    position = 0
+    for row, month in enumerate(range(m0, m1)):
+        start = (month * size + s0) * width
+        bit_generator.advance(start - position)
+        block[row] = generator.triangular(-1, 0, 1, (s1 - s0,) + rest)
+        position = start + (s1 - s0) * width
+    return block
+
+
+def _choice_ppf(u, a):
+    a = np.asarray(a)
+    return a[np.minimum((u * len(a)).astype(np.int64), len(a) - 1)]
+
+
+# inverse CDFs of numpy.random distributions, with numpy's parameter order and defaults
+INVERSE_CDFS = {
+    'normal': lambda u, loc=0., scale=1.: stats.norm.ppf(u, loc=loc, scale=scale),
+    'uniform': lambda u, low=0., high=1.: low + (high - low) * u,
+    'triangular': lambda u, left, mode, right: stats.triang.ppf(u, (mode - left) / (right - left), loc=left,
+                                                                scale=right - left),
+    'lognormal': lambda u, mean=0., sigma=1.: stats.lognorm.ppf(u, sigma, scale=np.exp(mean)),
+    'exponential': lambda u, scale=1.: stats.expon.ppf(u, scale=scale),
+    'gamma': lambda u, shape, scale=1.: stats.gamma.ppf(u, shape, scale=scale),
+    'beta': lambda u, a, b: stats.beta.ppf(u, a, b),
+    'choice': _choice_ppf,
+}
+
+
+def inverse_cdf(module_name, distribution_name):
+    """
+    The inverse CDF `f(u, *params)` of a distribution or None if it is not known.
+
+    numpy.random distributions are looked up in :data:`INVERSE_CDFS`, scipy.stats distributions use their `ppf`.
+    """
+    if module_name == 'numpy.random':
+        return INVERSE_CDFS.get(distribution_name)
+    if module_name == 'scipy.stats':
+        distribution = getattr(stats, distribution_name, None)
+        return getattr(distribution, 'ppf', None)
+    return None
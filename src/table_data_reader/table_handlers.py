@@ -17,7 +17,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from table_data_reader import param_name_maps, ParameterRepository, Parameter
+from table_data_reader import param_name_maps, ParameterRepository, Parameter, UnknownDistributionError
 
 
 class TableValidationError(ValueError):
@@ -773,6 +773,9 @@ class TableParameterLoader(object):
                                 parameter_kwargs_def[k][l] = w
             name_ = parameter_kwargs_def['name']
             del parameter_kwargs_def['name']
-            p = Parameter(name_, version=self.definition_version, **parameter_kwargs_def)
+            try:
+                p = Parameter(name_, version=self.definition_version, **parameter_kwargs_def)
+            except UnknownDistributionError as e:
+                raise TableValidationError(f'{e} for variable {name_} on sheet {sheet_name}') from e
             params.append(p)
         return params
@@ -0,0 +1,90 @@
+"""
+Integer month axis for the monthly time indices used by the time series generators.
+"""
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+class MonthAxis(object):
+    """
+    The months of a monthly (MonthBegin) time index as integer positions.
+
+    An axis is built once per time index and shared by all generators (see :func:`month_axis`), so placing a
+    ref date on the axis is integer arithmetic instead of datetime arithmetic for every parameter.
+    """
+    times: pd.DatetimeIndex
+    months: int
+
+    def __init__(self, times: pd.DatetimeIndex):
+        assert isinstance(times.freq, pd.tseries.offsets.MonthBegin), 'Time index must have monthly frequency'
+        self.times = times
+        self.start = times[0]
+        self.end = times[-1]
+        self.months = len(times)
+        self.first_month = self.start.year * 12 + self.start.month - 1
+        self.start_month = times.values[0].astype('datetime64[M]')
+
+        self.offsets = np.arange(self.months)
+        self.offsets.setflags(write=False)
+        # seconds since epoch of each month, as used by the interpolation of 'interp' variables
+        self.seconds = times.values.astype('datetime64[s]').astype(np.int64)
+        self.seconds.setflags(write=False)
+
+    def month_position(self, date) -> int:
+        """
+        Position of the month of a date on this axis. Dates before the axis start are negative.
+        """
+        return date.year * 12 + date.month - 1 - self.first_month
+
+    def offsets_from(self, ref_dates):
+        """
+        Signed number of whole months between the ref date and every month on the axis.
+
+        Months before the ref date are negative and consecutive months differ by exactly one. Whole months are
+        counted like `relativedelta`, i.e. a ref date after the first of a month before the axis start has not
+        completed that month yet.
+
+        :param ref_dates: a ref date, or a sequence of ref dates to place all of them at once
+        :return: 1-D int array with one entry per month, or an array of shape (months, n) with the offsets from
+            ref date i in column i
+        """
+        if np.ndim(ref_dates) == 0:
+            first = -self.month_position(ref_dates)
+            if first > 0 and (ref_dates.day != 1 or (isinstance(ref_dates, datetime.datetime)
+                                                     and ref_dates.time() != datetime.time())):
+                first -= 1
+            return self.offsets + first
+
+        ref_dates = np.asarray(ref_dates, dtype='datetime64[us]')
+        ref_months = ref_dates.astype('datetime64[M]')
+        first = (self.start_month - ref_months).astype(int)
+        first -= (first > 0) & (ref_dates > ref_months.astype('datetime64[us]'))
+        return self.offsets[:, np.newaxis] + first[np.newaxis, :]
+
+    def _key(self):
+        return self.start, self.months
+
+    def __eq__(self, other):
+        return isinstance(other, MonthAxis) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+@lru_cache(maxsize=64)
+def _month_axis(start, months):
+    return MonthAxis(pd.date_range(start, periods=months, freq='MS'))
+
+
+def month_axis(times: pd.DatetimeIndex) -> MonthAxis:
+    """
+    Get the shared :class:`MonthAxis` for a monthly time index.
+
+    Monthly indices are fully described by their start and length, so all generators sampling over the same
+    time index share one axis object.
+    """
+    assert isinstance(times.freq, pd.tseries.offsets.MonthBegin), 'Time index must have monthly frequency'
+    return _month_axis(times[0], len(times))
@@ -118,6 +118,56 @@ class ParameterTestCase(unittest.TestCase):
         # print(val)
         assert (val == 3.5).all()
 
+    def test_distribution_resolved_once(self):
+        from table_data_reader import distribution_registry
+        p = Parameter('a', module_name='numpy.random', distribution_name='choice', param_a='1, 2,6')
+        distribution = p.kwargs['distribution']
+        assert distribution.function is np.random.choice
+        np.testing.assert_array_equal(distribution.params[0], [1., 2., 6.])
+        assert distribution_registry.function('numpy.random', 'choice') is distribution.function
+
+    def test_unknown_distribution(self):
+        from table_data_reader import UnknownDistributionError
+        with self.assertRaises(UnknownDistributionError):
+            Parameter('a', module_name='numpy.random', distribution_name='nromal', param_a=1)
+        with self.assertRaises(UnknownDistributionError):
+            Parameter('a', module_name='numpy.randon', distribution_name='normal', param_a=1)
+
+    def test_register_distribution(self):
+        from table_data_reader import DistributionRegistry
+        registry = DistributionRegistry()
+        registry.register('custom', 'constant', lambda value, size=None: np.full(size, value))
+        distribution = registry.resolve('custom', 'constant', 4)
+        np.testing.assert_array_equal(distribution.function(*distribution.params, size=2), [4., 4.])
+
+    def test_analytic_means(self):
+        from table_data_reader import distribution_registry
+        rng = np.random.default_rng(1)
+        for name, params in [('lognormal', [0.5, 0.3]), ('gamma', [2., 3.]), ('beta', [2., 5.]),
+                             ('exponential', [4.]), ('poisson', [3.]), ('binomial', [10, 0.3]), ('weibull', [1.5]),
+                             ('gumbel', [1., 2.]), ('pareto', [3.]), ('geometric', [0.2]), ('rayleigh', [2.])]:
+            mean = distribution_registry.mean('numpy.random', name, params)
+            sample = getattr(rng, name)(*params, size=400000)
+            self.assertAlmostEqual(mean, sample.mean(), delta=4 * sample.std() / np.sqrt(len(sample)), msg=name)
+
+        self.assertAlmostEqual(distribution_registry.mean('scipy.stats', 'gamma', [2., 0., 3.]), 6.)
+
+    def test_mean_value_does_not_sample(self):
+        state = np.random.get_state()[1].copy()
+        for name, params in [('lognormal', dict(param_a=0.5, param_b=0.3)), ('poisson', dict(param_a=3.))]:
+            p = Parameter('a', module_name='numpy.random', distribution_name=name, **params)
+            val = p({'sample_mean_value': True, 'sample_size': 4, 'seed': 1})
+            assert len(set(val)) == 1
+        np.testing.assert_array_equal(np.random.get_state()[1], state)
+
+    def test_register_mean(self):
+        from table_data_reader import DistributionRegistry
+        registry = DistributionRegistry()
+        registry.register_mean('custom', 'pert', lambda a, b, c: (a + 4 * b + c) / 6.)
+        assert registry.mean('custom', 'pert', [0., 3., 6.]) == 3.
+        with self.assertRaises(ValueError):
+            registry.mean('custom', 'unknown', [])
+
     def test_get_mean_numerically(self):
         p = Parameter('a', module_name='numpy.random', distribution_name='normal', param_a=3,
                       param_b=4)
@@ -163,6 +213,259 @@ class ParameterTestCase(unittest.TestCase):
 
         pd.testing.assert_series_equal(val, expected)
 
+    def test_float32_dtype(self):
+        p = Parameter('test', version=2, unit='kg', ref_date=datetime.datetime(2009, 2, 1), type='exp',
+                      growth_factor=0.1, initial_value_proportional_variation=0.1, ef_growth_factor=0.1,
+                      **{'ref value': 2.})
+
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2010-01-01', freq='MS'),
+                    'sample_size': 4, 'dtype': 'float32'}
+        val = p(settings)
+        assert val.dtype == np.float32
+        assert (val > 0).all()
+
+        settings['with_pint_units'] = True
+        p.cache = None
+        val = p(settings)
+        assert val.pint.m.to_numpy().dtype == np.float32
+        assert str(val.pint.u) == 'kilogram'
+
+    def test_float32_dtype_v1(self):
+        p = Parameter('test', module_name='numpy.random', distribution_name='uniform', param_a=1, param_b=2, cagr=.1)
+
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2010-01-01', freq='MS'),
+                    'sample_size': 1, 'sample_mean_value': True, 'dtype': 'float32'}
+        a = p(settings)
+
+        assert a.dtype == np.float32
+        assert a.iloc[-1] == np.float32(1.5) * np.float32(1.1)
+
+    def test_group_series_matches_single_variables(self):
+        """
+        Each group of a group variable equals the same variable defined without groups
+        """
+        dates = pd.date_range('2009-01-01', '2011-01-01', freq='MS')
+        ref_values = {'A': 1., 'B': 2.}
+        growth_factors = {'A': 0.1, 'B': -0.2}
+        kwargs = dict(version=2, unit='kg', ref_date=datetime.datetime(2010, 1, 1), type='exp',
+                      initial_value_proportional_variation=0.1, ef_growth_factor=0.1)
+        settings = {'use_time_series': True, 'sample_mean_value': True, 'sample_size': 2, 'times': dates}
+
+        p = Parameter('test', growth_factor=growth_factors, **{'ref value': ref_values}, **kwargs)
+        val = p({**settings, 'with_group': True, 'group_vars': ['test'], 'groupings': ['A', 'B']})
+
+        for group in ['A', 'B']:
+            q = Parameter('test', growth_factor=growth_factors[group], **{'ref value': ref_values[group]}, **kwargs)
+            expected = q(settings)
+            np.testing.assert_array_equal(val.xs(group, level='group').values, expected.values)
+
+    def test_group_sigmas_single_unit_draw(self):
+        """
+        The noise of all groups is one unit triangular draw scaled by the variability of each group
+        """
+        from table_data_reader import RandomStreams
+        dates = pd.date_range('2009-01-01', '2009-12-01', freq='MS')
+        p = Parameter('test', version=2, unit='kg', ref_date=datetime.datetime(2009, 1, 1), type='exp',
+                      growth_factor=0, ef_growth_factor=0, initial_value_proportional_variation={'A': 0.1, 'B': 0.5},
+                      **{'ref value': {'A': 1., 'B': 4.}})
+        val = p({'use_time_series': True, 'sample_size': 5, 'times': dates, 'seed': 3, 'with_group': True,
+                 'group_vars': ['test'], 'groupings': ['A', 'B']})
+
+        noise = RandomStreams(3, 'test', p.scenario).generator().triangular(-1, 0, 1, (12, 5, 2))
+        expected = np.array([1., 4.]) + noise * np.array([0.1, 2.])
+        np.testing.assert_allclose(val.values, expected.ravel(), rtol=1e-12)
+
+    def test_interp_matches_scipy(self):
+        from scipy.interpolate import interp1d
+        from table_data_reader.interpolation import parse_interp_knots, linear_interpolation
+
+        seconds, values = parse_interp_knots('{"2012-01-01": 3, "2010-01-01": 1}')
+        assert list(values) == [1., 3.]
+
+        dates = pd.date_range('2008-01-01', '2014-01-01', freq='MS')
+        x = dates.values.astype('datetime64[s]').astype(np.int64)
+        expected = interp1d(seconds, values, fill_value='extrapolate')(x)
+        np.testing.assert_allclose(linear_interpolation(x, seconds, values), expected, rtol=1e-12)
+
+        p = Parameter('test', version=2, type='interp', param='linear', ref_date=datetime.datetime(2010, 1, 1),
+                      initial_value_proportional_variation=0.1, ef_growth_factor=0.1,
+                      **{'ref value': '{"2012-01-01": 3, "2010-01-01": 1}'})
+        val = p({'use_time_series': True, 'sample_mean_value': True, 'sample_size': 1, 'times': dates})
+        np.testing.assert_allclose(val.values, expected, rtol=1e-12)
+
+    def test_lazy_result(self):
+        from table_data_reader import SampleResult
+        p = Parameter('test', version=2, unit='kg', ref_date=datetime.datetime(2009, 2, 1), type='exp',
+                      growth_factor=0.1, initial_value_proportional_variation=0.1, ef_growth_factor=0.1,
+                      **{'ref value': 2.})
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2010-01-01', freq='MS'),
+                    'sample_size': 4}
+
+        np.random.seed(1)
+        expected = p(settings)
+        p.cache = None
+        np.random.seed(1)
+        val = p({**settings, 'lazy_result': True})
+
+        assert isinstance(val, SampleResult)
+        assert val.array.shape == (13, 4)
+        np.testing.assert_array_equal(val.values, expected.values)
+        # the series is only built when pandas behaviour is used
+        assert val._series is None
+        pd.testing.assert_series_equal(val.to_series(), expected)
+        assert val.loc[datetime.datetime(2009, 2, 1)].shape == (4,)
+        pd.testing.assert_series_equal(val * 2, expected * 2)
+        pd.testing.assert_series_equal(expected + val, expected * 2)
+
+    def test_mean_value_view(self):
+        dates = pd.date_range('2009-01-01', '2009-12-01', freq='MS')
+        settings = {'use_time_series': True, 'sample_mean_value': True, 'sample_size': 4, 'times': dates}
+        for version in [1, 2]:
+            p = Parameter('test', version=version, unit='kg', ref_date=datetime.datetime(2009, 6, 1), type='exp',
+                          growth_factor=0.1, initial_value_proportional_variation=0.1, ef_growth_factor=0.1,
+                          module_name='numpy.random', distribution_name='normal', param_a=2., param_b=1., cagr=0.1,
+                          **{'ref value': 2.})
+            result = p({**settings, 'lazy_result': True})
+            # the trend broadcast over the samples, without copies
+            assert result.array.strides[1] == 0 and not result.array.flags.writeable
+            p.cache = None
+            expected = p(settings).values
+            np.testing.assert_array_equal(result.values, expected)
+
+            array = result.writable_array()
+            array[0, 0] = -1
+            assert result.writable_array() is array
+
+        val = Parameter('a', module_name='numpy.random', distribution_name='uniform', param_a=2, param_b=4)(
+            {'sample_mean_value': True, 'sample_size': 5, 'lazy_result': True})
+        assert not val.flags.writeable and (val == 3).all()
+
+    def test_cache_by_settings(self):
+        p = Parameter('test', version=2, unit='kg', ref_date=datetime.datetime(2009, 2, 1), type='exp',
+                      growth_factor=0.1, initial_value_proportional_variation=0.1, ef_growth_factor=0.1,
+                      **{'ref value': 2.})
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2010-01-01', freq='MS'),
+                    'sample_size': 4}
+        first = p(settings)
+        # equal settings hit the cache, also with copies of the times and in another key order
+        assert p(dict(reversed(list({**settings, 'times': settings['times'].copy()}.items())))) is first
+
+        # other settings are sampled instead of returning the cached values
+        longer = p({**settings, 'sample_size': 8})
+        assert len(longer) == 13 * 8
+        shorter = p({**settings, 'times': settings['times'][:6]})
+        assert len(shorter) == 6 * 4
+        assert p(settings) is first and p.cache is first
+
+        # the least recently used settings are evicted
+        p.cache_size = 2
+        p({**settings, 'sample_size': 2})
+        assert p({**settings, 'sample_size': 8}) is not longer
+        assert p(settings) is not first
+
+        p.clear_cache()
+        assert p.cache is None and p.negative_values is None
+
+    def test_fingerprint(self):
+        from table_data_reader.caching import fingerprint
+        a = pd.Series(np.arange(1000.))
+        b = a.copy()
+        b[500] = -1
+        # long pandas objects are fingerprinted by content, not by their truncated repr
+        assert fingerprint({'x': a}) != fingerprint({'x': b})
+        assert fingerprint({'x': a.to_frame()}) != fingerprint({'x': b.to_frame()})
+        assert fingerprint({'x': a}) == fingerprint({'x': a.copy()})
+        with self.assertRaises(TypeError):
+            fingerprint({'x': bytearray(3)})
+
+        # immutable values are canonicalised once, whether they are equal or the same objects
+        times = pd.date_range('2009-01-01', periods=3, freq='MS')
+        group_vars = tuple(f'v{i}' for i in range(20))
+        settings = {'times': times, 'sample_size': 4, 'group_vars': group_vars, 'groupings': ['UK', 'DE']}
+        assert fingerprint(settings) == fingerprint(settings)
+        assert fingerprint(settings) == fingerprint({**settings, 'times': times.copy(), 'group_vars': tuple(list(group_vars))})
+        assert fingerprint(settings) != fingerprint({**settings, 'group_vars': group_vars[1:]})
+
+    def test_cache_edited_settings(self):
+        p = Parameter('p', version=2, unit='kg', ref_date=datetime.datetime(2009, 2, 1), type='exp', growth_factor=0,
+                      initial_value_proportional_variation={'UK': 0.1, 'DE': 0.1, 'FR': 0.1}, ef_growth_factor=0,
+                      **{'ref value': {'UK': 1., 'DE': 2., 'FR': 3.}})
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2009-03-01', freq='MS'),
+                    'sample_size': 2, 'sample_mean_value': True, 'with_group': True, 'group_vars': ['p'],
+                    'groupings': ['UK', 'DE']}
+        first = p(settings)
+        # containers edited in place are not mistaken for the settings of the cached values
+        settings['groupings'][1] = 'FR'
+        second = p(settings)
+        assert second is not first
+        assert list(second.index.get_level_values('group').unique()) == ['UK', 'FR']
+        assert second.iloc[-1] == 3.
+
+    def test_compact_parameter(self):
+        import pickle
+        import sys
+        p = Parameter('test', unit=''.join(['k', 'g']), module_name='numpy.random', distribution_name='normal',
+                      param_a=2., param_b=1.)
+        assert not hasattr(p, '__dict__')
+        # nothing is allocated for the cache, lock and usages until they are needed
+        assert p._cache is None and p._lock is None and p._processes is None
+        # repeated strings are stored once
+        assert p.unit is sys.intern('kg') and p.kwargs['module_name'] is sys.intern('numpy.random')
+
+        values = p({'sample_size': 3})
+        p.add_usage('process', 'variable')
+        copy = pickle.loads(pickle.dumps(p))
+        assert copy.processes == {'process': ['variable']} and copy.kwargs['param_a'] == 2.
+        np.testing.assert_array_equal(copy({'sample_size': 3}), values)
+
+    def test_shared_index(self):
+        kwargs = dict(version=2, unit='kg', ref_date=datetime.datetime(2009, 2, 1), type='exp', growth_factor=0.1,
+                      initial_value_proportional_variation=0.1, ef_growth_factor=0.1)
+        p = Parameter('p', **kwargs, **{'ref value': 2.})
+        q = Parameter('q', **kwargs, **{'ref value': 3.})
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2010-01-01', freq='MS'),
+                    'sample_size': 4}
+
+        a, b = p(settings), q(settings)
+        # the levels and codes are shared, the names are not
+        assert np.shares_memory(np.asarray(a.index.codes[1]), np.asarray(b.index.codes[1]))
+        a.index.names = ['t', 's']
+        assert list(b.index.names) == ['time', 'samples']
+        assert list(Parameter('r', **kwargs, **{'ref value': 4.})(settings).index.names) == ['time', 'samples']
+
+    def test_index_cache_bytes(self):
+        from table_data_reader import results
+        from table_data_reader.time_axis import month_axis
+        axis = month_axis(pd.date_range('2009-01-01', '2010-01-01', freq='MS'))
+        results.sample_index.cache_clear()
+        size_bytes = results.sample_index(axis, 100).nbytes
+        limit = results.INDEX_CACHE_BYTES
+        results.INDEX_CACHE_BYTES = 2 * size_bytes
+        try:
+            for size in [101, 102, 103]:
+                results.sample_index(axis, size)
+            info = results.sample_index.cache_info()
+            assert info.currbytes <= 2 * size_bytes
+            assert info.currsize < 4
+            results.sample_index(axis, 103)
+            assert results.sample_index.cache_info().hits == 1
+        finally:
+            results.INDEX_CACHE_BYTES = limit
+            results.sample_index.cache_clear()
+
+    def test_find_non_positive(self):
+        from table_data_reader import find_non_positive
+        times = pd.date_range('2009-01-01', '2009-04-01', freq='MS')
+        values = np.ones((4, 3, 2))
+
+        assert find_non_positive(values, times) is None
+
+        values[2, 1, 0] = 0
+        values[3, :, 1] = -1
+        negative_values = find_non_positive(values, times)
+        assert negative_values.first_month == times[2]
+        assert negative_values.count == 4
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -22,6 +22,91 @@ class ParameterRepositoryTestCase(unittest.TestCase):
 
         assert param.cache == None
 
+    def test_clear_cache_index(self):
+        import pandas as pd
+        from table_data_reader import sample_index, month_axis
+        sample_index(month_axis(pd.date_range('2009-01-01', '2009-06-01', freq='MS')), 10)
+        assert sample_index.cache_info().currsize > 0
+
+        ParameterRepository().clear_cache()
+
+        assert sample_index.cache_info().currsize == 0
+
+    def test_cache_manager(self):
+        from table_data_reader import CacheManager
+        manager = CacheManager(max_bytes=2000)
+        repo = ParameterRepository(cache_manager=manager)
+        for name in ['a', 'b', 'c']:
+            repo.add_parameter(Parameter(name, module_name='numpy.random', distribution_name='normal', param_a=0,
+                                         param_b=1))
+        settings = {'sample_size': 100}
+        repo['a'](settings)
+        repo['b'](settings)
+        repo['a'](settings)
+        assert manager.bytes == 1600
+        repo['c'](settings)
+        assert manager.bytes <= 2000
+        assert manager.totals() == {'entries': 2, 'bytes': 1600, 'hits': 1, 'misses': 3, 'evictions': 1}
+        stats = manager.stats().set_index('name')
+        assert stats.loc['c', 'bytes'] == 800 and stats.loc['a', 'hits'] == 1
+        assert stats['evictions'].sum() == 1 and stats.loc[stats['evictions'] == 1, 'entries'].iloc[0] == 0
+
+        repo.clear_cache()
+        assert manager.bytes == 0 and manager.totals()['evictions'] == 1
+
+    def test_cache_manager_priorities(self):
+        import numpy as np
+        from table_data_reader import CacheManager
+        manager = CacheManager(max_bytes=1600)
+        x, y, z, w = [Parameter(name) for name in 'xyzw']
+        for p in [x, y, z, w]:
+            p.cache_manager = manager
+        values = np.zeros(100)
+        # the cheapest value per byte is evicted first
+        x._cache_put('k', values, None, cost=1.)
+        y._cache_put('k', values, None, cost=3.)
+        z._cache_put('k', values, None, cost=1.)
+        assert x.cache is None and y.cache is values
+        # evictions advance the clock, so a hit renews the priority of an older value
+        w._cache_put('k', values, None, cost=2.)
+        assert z.cache is None
+        manager.hit(y, 'k')
+        z._cache_put('l', values, None, cost=2.)
+        assert y.cache is values and w.cache is None
+
+    def test_cache_manager_batch_hits(self):
+        from table_data_reader import CacheManager
+        manager = CacheManager()
+        repo = ParameterRepository(cache_manager=manager)
+        for name in ['a', 'b']:
+            repo.add_parameter(Parameter(name, module_name='numpy.random', distribution_name='normal', param_a=0,
+                                         param_b=1))
+        settings = {'sample_size': 10, 'seed': 1}
+        repo['a'](settings)
+        repo.sample_parallel(settings, executor='thread', max_workers=2)
+        repo.sample_all(settings)
+
+        stats = manager.stats().set_index('name')
+        assert stats.loc['a', 'hits'] == 2 and stats.loc['a', 'misses'] == 1
+        assert stats.loc['b', 'hits'] == 1 and stats.loc['b', 'misses'] == 1
+
+    def test_cache_manager_many_hits(self):
+        import numpy as np
+        from table_data_reader import CacheManager
+        manager = CacheManager(max_bytes=1600)
+        x, y, z = [Parameter(name) for name in 'xyz']
+        for p in [x, y, z]:
+            p.cache_manager = manager
+        values = np.zeros(100)
+        x._cache_put('k', values, None)
+        y._cache_put('k', values, None)
+        # outdated priorities of hits are skipped when choosing the victim
+        for _ in range(500):
+            manager.hit(x, 'k')
+        z._cache_put('k', values, None)
+        assert x.cache is values and y.cache is None
+        assert len(manager._heap) <= 2 * len(manager._entries) + 64
+
     @unittest.skip('no assertion')
     def test_add_parameter(self):
         p = Parameter('test')
@@ -187,6 +272,28 @@ class ParameterRepositoryTestCase(unittest.TestCase):
 
         assert repo.get_parameter('test', 's1').tags == 't1,t2'
 
+    def test_negative_values_report(self):
+        import datetime
+        import pandas as pd
+        kwargs = dict(version=2, ref_date=datetime.datetime(2009, 1, 1), type='exp', growth_factor=-0.5,
+                      initial_value_proportional_variation=0.1, ef_growth_factor=0)
+        repo = ParameterRepository()
+        repo.add_parameter(Parameter('positive', **kwargs, **{'ref value': 1.}))
+        repo.add_parameter(Parameter('negative', **kwargs, **{'ref value': -1.}))
+
+        settings = {'use_time_series': True, 'times': pd.date_range('2009-01-01', '2009-12-01', freq='MS'),
+                    'sample_size': 3, 'sample_mean_value': True, 'log_negative_values': False}
+        repo['positive'](settings)
+        repo['negative'](settings)
+
+        report = repo.negative_values_report()
+        assert list(report['name']) == ['negative']
+        assert report['first_month'][0] == pd.Timestamp('2009-01-01')
+        assert report['count'][0] == 36
+
+        repo.clear_cache()
+        assert repo.negative_values_report().empty
+
 
 if __name__ == '__main__':
     unittest.main()
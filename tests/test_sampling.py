@@ -0,0 +1,372 @@
+import datetime
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from table_data_reader import Parameter, RandomStreams
+from table_data_reader.sampling import stratified_uniform, unit_triangular_ppf
+
+times = pd.date_range('2009-01-01', '2010-01-01', freq='MS')
+
+
+def time_series_parameter(name, **kwargs):
+    defaults = dict(version=2, unit='kg', ref_date=datetime.datetime(2009, 6, 1), type='exp', growth_factor=0.1,
+                    initial_value_proportional_variation=0.2, ef_growth_factor=0.1, **{'ref value': 2.})
+    defaults.update(kwargs)
+    return Parameter(name, **defaults)
+
+
+def sample_in_process(name):
+    return time_series_parameter(name)({'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7}).values
+
+
+class RandomStreamsTestCase(unittest.TestCase):
+
+    def test_streams_depend_on_key_only(self):
+        a = RandomStreams(1, 'p', 'default').generator().random(4)
+        b = RandomStreams(1, 'p', 'default').generator().random(4)
+        np.testing.assert_array_equal(a, b)
+
+        for other in [RandomStreams(2, 'p', 'default'), RandomStreams(1, 'q', 'default'),
+                      RandomStreams(1, 'p', 's1')]:
+            assert not np.array_equal(a, other.generator().random(4))
+        assert not np.array_equal(a, RandomStreams(1, 'p', 'default').generator('UK').random(4))
+
+    def test_seeded_sampling_is_order_independent(self):
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7}
+
+        p, q = time_series_parameter('p'), time_series_parameter('q')
+        p_first = p(settings).values
+        q_second = q(settings).values
+
+        p, q = time_series_parameter('p'), time_series_parameter('q')
+        np.random.seed(3)
+        q_first = q(settings).values
+        p_second = p(settings).values
+
+        np.testing.assert_array_equal(p_first, p_second)
+        np.testing.assert_array_equal(q_first, q_second)
+        assert not np.array_equal(p_first, q_first)
+
+    def test_seeded_distribution(self):
+        settings = {'sample_size': 16, 'seed': 7}
+        a = Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=0, param_b=1)(settings)
+        b = Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=0, param_b=1)(settings)
+        np.testing.assert_array_equal(a, b)
+
+    def test_seeded_legacy_and_scipy_distributions(self):
+        settings = {'sample_size': 16, 'seed': 7}
+        for module_name, distribution_name, params in [('numpy.random', 'randint', dict(param_a=0, param_b=10)),
+                                                       ('numpy.random', 'random_sample', {}),
+                                                       ('numpy.random', 'random_integers', dict(param_a=1, param_b=6)),
+                                                       ('scipy.stats', 'norm', dict(param_a=2, param_b=1))]:
+            values = [Parameter('d', module_name=module_name, distribution_name=distribution_name, **params)(settings)
+                      for _ in range(2)]
+            assert values[0].shape == (16,)
+            np.testing.assert_array_equal(values[0], values[1])
+
+    def test_seeded_custom_distribution_warns(self):
+        from table_data_reader import distribution_registry
+        distribution_registry.register('tests.custom', 'uniform', lambda size: np.random.uniform(size=size))
+        with self.assertLogs('table_data_reader.sampling', level='WARNING'):
+            Parameter('c', module_name='tests.custom', distribution_name='uniform')({'sample_size': 4, 'seed': 7})
+
+    def test_seeded_sampling_in_processes(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(sample_in_process, ['p', 'q']))
+
+        np.testing.assert_array_equal(results[0], sample_in_process('p'))
+        np.testing.assert_array_equal(results[1], sample_in_process('q'))
+
+
+class SamplingModeTestCase(unittest.TestCase):
+
+    def test_stratified_uniform(self):
+        for mode in ['lhs', 'sobol']:
+            u = stratified_uniform((12, 8, 2), mode, np.random.default_rng(1), axis=1)
+            assert u.shape == (12, 8, 2)
+            # each month and group has exactly one sample in each of the 8 strata
+            strata = np.sort(np.floor(u * 8), axis=1)
+            np.testing.assert_array_equal(strata, np.broadcast_to(np.arange(8)[:, np.newaxis], (12, 8, 2)))
+
+    def test_sobol_limits(self):
+        import warnings
+        with self.assertLogs('table_data_reader.sampling', level='WARNING'), warnings.catch_warnings():
+            warnings.simplefilter('error')
+            # too many dimensions for Sobol', stratified by a latin hypercube instead
+            u = stratified_uniform((480, 8, 50), 'sobol', np.random.default_rng(1), axis=1)
+            strata = np.sort(np.floor(u * 8), axis=1)
+            np.testing.assert_array_equal(strata, np.broadcast_to(np.arange(8)[:, np.newaxis], (480, 8, 50)))
+            # not a power of two
+            assert stratified_uniform((12, 6), 'sobol', np.random.default_rng(1), axis=1).shape == (12, 6)
+
+    def test_unit_triangular_ppf(self):
+        u = np.random.default_rng(1).random(100000)
+        noise = unit_triangular_ppf(u)
+        assert noise.min() >= -1 and noise.max() <= 1
+        # P(X <= x) = (1 + x)^2 / 2 for x <= 0
+        self.assertAlmostEqual(np.mean(noise <= -0.5), 0.125, places=2)
+
+    def test_lhs_distribution(self):
+        from scipy import stats
+        settings = {'sample_size': 50, 'seed': 7, 'sampling_mode': 'lhs'}
+        values = Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=2, param_b=3)(settings)
+        strata = np.sort(np.floor(stats.norm.cdf(values, loc=2, scale=3) * 50))
+        np.testing.assert_array_equal(strata, np.arange(50))
+
+    def test_lhs_time_series(self):
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 64, 'seed': 7, 'sampling_mode': 'lhs',
+                    'lazy_result': True}
+        p = time_series_parameter('p', growth_factor=0, ef_growth_factor=0)
+        array = p(settings).array
+        # the stratified noise of every month averages out to almost exactly zero
+        np.testing.assert_allclose(array.mean(axis=1), 2., atol=5e-3)
+
+    def test_antithetic_pairs(self):
+        for size in [8, 7]:
+            settings = {'use_time_series': True, 'times': times, 'sample_size': size, 'seed': 7, 'antithetic': True,
+                        'lazy_result': True}
+            p = time_series_parameter('p', growth_factor=0, ef_growth_factor=0)
+            array = p(settings).array
+            assert array.shape == (13, size)
+            # samples 2k and 2k + 1 mirror each other around the mean
+            np.testing.assert_allclose(array[:, 0:size - 1:2] + array[:, 1::2], 4.)
+            assert not np.allclose(array[:, 0::2], 2.)
+
+    def test_antithetic_groups(self):
+        p = time_series_parameter('p', initial_value_proportional_variation={'A': 0.2, 'B': 0.5},
+                                  **{'ref value': {'A': 2., 'B': 5.}})
+        array = p({'use_time_series': True, 'times': times, 'sample_size': 4, 'seed': 7, 'antithetic': True,
+                   'with_group': True, 'group_vars': ['p'], 'groupings': ['A', 'B'], 'lazy_result': True}).array
+        assert array.shape == (13, 4, 2)
+        deviations = array - array.mean(axis=1, keepdims=True)
+        np.testing.assert_allclose(deviations[:, 0::2], -deviations[:, 1::2], atol=1e-12)
+
+    def test_unknown_sampling_mode(self):
+        with self.assertRaises(ValueError):
+            time_series_parameter('p')({'use_time_series': True, 'times': times, 'sample_size': 2,
+                                        'sampling_mode': 'qmc'})
+
+
+def assemble(blocks, months, size, *groups):
+    array = np.full((months, size) + groups, np.nan)
+    for block in blocks:
+        array[block.months, block.samples] = block.values
+    return array
+
+
+class StreamingTestCase(unittest.TestCase):
+    settings = {'use_time_series': True, 'times': times, 'sample_size': 9, 'seed': 7, 'lazy_result': True}
+
+    def test_blocks_equal_full_call(self):
+        for extra in [{}, {'antithetic': True}, {'sample_mean_value': True}, {'sampling_mode': 'lhs'}]:
+            settings = {**self.settings, **extra}
+            expected = time_series_parameter('p')(settings).array
+            for block_sizes in [dict(months_per_block=5), dict(samples_per_block=4),
+                                dict(months_per_block=2, samples_per_block=3), dict(max_bytes=100)]:
+                blocks = list(time_series_parameter('p').iter_blocks(settings, **block_sizes))
+                assert len(blocks) > 1
+                np.testing.assert_array_equal(assemble(blocks, 13, 9), expected)
+
+    def test_group_blocks_equal_full_call(self):
+        settings = {**self.settings, 'with_group': True, 'group_vars': ['p'], 'groupings': ['A', 'B']}
+        kwargs = dict(initial_value_proportional_variation={'A': 0.2, 'B': 0.5}, **{'ref value': {'A': 2., 'B': 5.}})
+        expected = time_series_parameter('p', **kwargs)(settings).array
+        blocks = time_series_parameter('p', **kwargs).iter_blocks(settings, months_per_block=4, samples_per_block=5)
+        np.testing.assert_array_equal(assemble(blocks, 13, 9, 2), expected)
+
+    def test_plan_blocks_budget(self):
+        from table_data_reader.blocks import plan_blocks
+        # 10 samples of 8 bytes per month, 3 months fit into 256 bytes
+        assert plan_blocks(13, 10, max_bytes=256)[0] == (slice(0, 3), slice(0, 10))
+        # a month does not fit, split it into samples
+        assert plan_blocks(13, 10, max_bytes=32)[:2] == [(slice(0, 1), slice(0, 4)), (slice(0, 1), slice(4, 8))]
+
+    def test_repository_blocks(self):
+        from table_data_reader import ParameterRepository
+        repository = ParameterRepository()
+        repository.add_parameter(time_series_parameter('p'))
+        repository.add_parameter(time_series_parameter('q'))
+        blocks = list(repository.iter_blocks(self.settings, samples_per_block=5))
+        assert [name for name, _ in blocks] == ['p', 'p', 'q', 'q']
+        assert repository['p'].cache is None
+
+        d = Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=0, param_b=1)
+        blocks = list(d.iter_blocks({'sample_size': 9, 'seed': 7}, samples_per_block=5))
+        assert blocks[1].months is None and blocks[1].values.shape == (4,)
+
+
+class SampleAllTestCase(unittest.TestCase):
+    settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7, 'with_group': True,
+                'group_vars': ['g'], 'groupings': ['A', 'B']}
+
+    def repository(self):
+        from table_data_reader import ParameterRepository
+        repository = ParameterRepository()
+        repository.add_parameter(time_series_parameter('p'))
+        repository.add_parameter(time_series_parameter('g', initial_value_proportional_variation={'A': 0.2, 'B': 0.5},
+                                                       **{'ref value': {'A': 2., 'B': 5.}}))
+        repository.add_parameter(Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=1,
+                                           param_b=2))
+        return repository
+
+    def test_cube_equals_calls(self):
+        serial = self.repository()
+        settings = {**self.settings, 'lazy_result': True}
+        p, g = serial['p'](settings).array, serial['g'](settings).array
+
+        for order in ['C', 'F']:
+            repository = self.repository()
+            # cached values are copied, the others generated into the cube
+            repository['g'](self.settings)
+            cube = repository.sample_all(self.settings, names=['p', 'g'], order=order, max_bytes=256)
+            assert cube.values.shape == (2, 13, 8, 2) and cube.values.flags[f'{order}_CONTIGUOUS']
+            assert cube.slots == {'p': 0, 'g': 1} and repository['p'].cache is None
+            # parameters without groups are repeated over the groups
+            np.testing.assert_array_equal(cube['p'], np.repeat(p[..., np.newaxis], 2, axis=2))
+            np.testing.assert_array_equal(cube['g'], g)
+
+    def test_distribution_cube(self):
+        repository = self.repository()
+        cube = repository.sample_all({'sample_size': 8, 'seed': 7, 'dtype': np.float32}, names=['d'])
+        assert cube.values.shape == (1, 8) and cube.values.dtype == np.float32
+        expected = self.repository()['d']({'sample_size': 8, 'seed': 7, 'dtype': np.float32})
+        np.testing.assert_array_equal(cube['d'], expected)
+        with self.assertRaises(ValueError):
+            repository.sample_all({'sample_size': 8}, order='K')
+
+
+class DiskCacheTestCase(unittest.TestCase):
+    settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7}
+
+    def test_disk_cache(self):
+        import os
+        import tempfile
+        from table_data_reader import DiskCache
+        with tempfile.TemporaryDirectory() as directory:
+            disk_cache = DiskCache(directory)
+            expected = time_series_parameter('p', **{'ref value': -2.})(self.settings)
+
+            p = time_series_parameter('p', **{'ref value': -2.})
+            p.disk_cache = disk_cache
+            generated = p({**self.settings, 'lazy_result': True})
+            pd.testing.assert_series_equal(generated.to_series(), expected)
+            assert len(os.listdir(directory)) == 2
+            # the generating call returns the values in memory, not the file
+            assert not isinstance(generated.array, np.memmap) and generated.array.flags.writeable
+
+            # a later run memory-maps the samples, also for lazy results
+            p = time_series_parameter('p', **{'ref value': -2.})
+            p.disk_cache = disk_cache
+            result = p({**self.settings, 'lazy_result': True})
+            assert isinstance(result.array, np.memmap) and len(os.listdir(directory)) == 2
+            np.testing.assert_array_equal(result.values, expected.values)
+            # copy-on-write, changes do not reach the file
+            result.array[0, 0] = 5
+            p.clear_cache()
+            assert p({**self.settings, 'lazy_result': True}).array[0, 0] == expected.values[0]
+            pd.testing.assert_series_equal(p(self.settings), expected)
+            assert p.negative_values.count > 0
+
+            # changed definitions and unseeded runs are not read from disk
+            q = time_series_parameter('p', growth_factor=0.1)
+            q.disk_cache = disk_cache
+            assert not np.array_equal(q(self.settings).values, expected.values)
+            assert len(os.listdir(directory)) == 4
+            q({**self.settings, 'seed': None})
+            assert len(os.listdir(directory)) == 4
+
+            d = Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=1, param_b=2)
+            d.disk_cache = disk_cache
+            values = d({'sample_size': 8, 'seed': 7})
+            np.testing.assert_array_equal(values, Parameter('d', module_name='numpy.random', distribution_name='normal',
+                                                            param_a=1, param_b=2)({'sample_size': 8, 'seed': 7}))
+            disk_cache.clear()
+            assert os.listdir(directory) == []
+
+
+class ParallelSamplingTestCase(unittest.TestCase):
+
+    def repository(self):
+        from table_data_reader import ParameterRepository
+        repository = ParameterRepository()
+        for name in ['p', 'q', 'r']:
+            repository.add_parameter(time_series_parameter(name))
+        repository.add_parameter(time_series_parameter('g', initial_value_proportional_variation={'A': 0.2, 'B': 0.5},
+                                                       **{'ref value': {'A': 2., 'B': 5.}}))
+        return repository
+
+    def test_processes_equal_serial(self):
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7, 'with_group': True,
+                    'group_vars': ['g'], 'groupings': ['A', 'B']}
+        repository = self.repository()
+        values = repository.sample_parallel(settings, max_workers=2)
+        assert repository['q'].cache is values['q']
+
+        serial = self.repository()
+        for name in ['p', 'q', 'r', 'g']:
+            expected = serial[name](settings)
+            pd.testing.assert_series_equal(values[name], expected)
+
+    def test_processes_own_memory(self):
+        from table_data_reader.parallel import sample_in_processes
+        repository = self.repository()
+        parameters = {name: repository[name] for name in ['p', 'q']}
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7, 'lazy_result': True}
+        results = sample_in_processes(parameters, settings, max_workers=2)
+        # every value is its own array rather than a view into one block holding all parameters
+        for result, _ in results.values():
+            assert result.array.base is None
+            assert result.array.flags.writeable
+
+    def test_threads_equal_serial(self):
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8, 'seed': 7, 'with_group': True,
+                    'group_vars': ['g'], 'groupings': ['A', 'B']}
+        values = self.repository().sample_parallel(settings, max_workers=3, executor='thread')
+
+        serial = self.repository()
+        for name in ['p', 'q', 'r', 'g']:
+            pd.testing.assert_series_equal(values[name], serial[name](settings))
+
+    def test_threads_unseeded(self):
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8}
+        repository = self.repository()
+        for executor in ['thread', 'process']:
+            repository.clear_cache()
+            values = repository.sample_parallel(settings, names=['p', 'q'], max_workers=2, executor=executor)
+            assert values['p'] is not None and values['p'].shape == (13 * 8,)
+            # cached under the caller's settings, so later calls do not sample again
+            assert repository['p'](settings) is values['p']
+            np.testing.assert_array_equal(repository.sample_all(settings, names=['q'])['q'].reshape(-1),
+                                          values['q'].values)
+
+    def test_concurrent_calls_sample_once(self):
+        from concurrent.futures import ThreadPoolExecutor
+        import pickle
+        p = time_series_parameter('p')
+        settings = {'use_time_series': True, 'times': times, 'sample_size': 8}
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: p(settings), range(16)))
+        assert all(result is results[0] for result in results)
+
+        copy = pickle.loads(pickle.dumps(p))
+        pd.testing.assert_series_equal(copy(settings), results[0])
+
+    def test_processes_lazy_distributions(self):
+        from table_data_reader import ParameterRepository, SampleResult
+        repository = ParameterRepository()
+        repository.add_parameter(Parameter('d', module_name='numpy.random', distribution_name='normal', param_a=1,
+                                           param_b=2))
+        repository.add_parameter(time_series_parameter('p'))
+        values = repository.sample_parallel({'sample_size': 8}, names=['d'], max_workers=2)
+        assert values['d'].shape == (8,) and repository['p'].cache is None
+
+        values = repository.sample_parallel({'use_time_series': True, 'times': times, 'sample_size': 8,
+                                             'lazy_result': True}, names=['p'], max_workers=2)
+        assert isinstance(values['p'], SampleResult) and values['p'].array.shape == (13, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
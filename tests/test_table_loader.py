@@ -9,7 +9,8 @@ from os import path
 
 from scipy import stats
 import pint
-from table_data_reader import ParameterRepository, growth_coefficients
+from table_data_reader import ParameterRepository, growth_coefficients, growth_vector
+from table_data_reader.growth import month_offsets
 from table_data_reader.table_handlers import TableParameterLoader
 
 def get_static_path(filename):
@@ -369,3 +370,83 @@ class TestCAGRCalculation(unittest.TestCase):
 
         # the last row has positive coefficients
         assert np.all(a[-1] == np.ones((samples, 1)) * pow(1 + alpha, float(total_months - 1 - ref_row_idx) / 12))
+
+    def test_growth_vector_matches_coefficients(self):
+        """
+        The growth vector is a single column of the growth coefficient matrix
+        """
+        alpha = 0.1
+        ref_date = date(2009, 3, 1)
+        start_date = date(2009, 1, 1)
+        end_date = date(2009, 6, 1)
+
+        v = growth_vector(start_date, end_date, ref_date, alpha)
+        a = growth_coefficients(start_date, end_date, ref_date, alpha, 3)
+
+        assert v.shape == (6,)
+        assert np.all(a == v[:, np.newaxis])
+
+    def test_growth_vector_refdate_before_start(self):
+        alpha = 0.1
+        ref_date = date(2008, 1, 1)
+        start_date = date(2009, 1, 1)
+        end_date = date(2009, 2, 1)
+
+        v = growth_vector(start_date, end_date, ref_date, alpha)
+        assert v.shape == (2,)
+        assert v[0] == pow(1 + alpha, 12. / 12)
+        assert v[1] == pow(1 + alpha, 13. / 12)
+
+    def test_cached_growth_vector_reuse(self):
+        from table_data_reader import cached_growth_vector, month_axis
+        cached_growth_vector.cache_clear()
+
+        axis = month_axis(pd.date_range('2009-01-01', '2009-06-01', freq='MS'))
+        v = cached_growth_vector(axis, date(2009, 3, 1), 0.1)
+        # an equal time index maps onto the same axis and hits the cache
+        axis = month_axis(pd.date_range('2009-01-01', '2009-06-01', freq='MS'))
+        w = cached_growth_vector(axis, date(2009, 3, 1), 0.1)
+
+        assert v is w
+        assert not v.flags.writeable
+        assert np.all(v == growth_vector(date(2009, 1, 1), date(2009, 6, 1), date(2009, 3, 1), 0.1))
+        info = cached_growth_vector.cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
+
+    def test_month_axis_offsets(self):
+        from table_data_reader import month_axis
+        axis = month_axis(pd.date_range('2009-01-01', '2010-06-01', freq='MS'))
+
+        assert axis.months == 18
+        ref_dates = [date(2008, 6, 1), date(2009, 3, 1), date(2011, 1, 1), date(2008, 6, 15), date(2009, 3, 15),
+                     date(2011, 1, 15)]
+        for ref_date in ref_dates:
+            assert np.all(axis.offsets_from(ref_date) == month_offsets(date(2009, 1, 1), date(2010, 6, 1), ref_date))
+        for i, ref_date in enumerate(ref_dates):
+            assert np.all(axis.offsets_from(ref_dates)[:, i] == axis.offsets_from(ref_date))
+
+    def test_month_axis_offsets_mid_month(self):
+        from table_data_reader import month_axis, growth_matrix
+        axis = month_axis(pd.date_range('2009-01-01', '2010-12-01', freq='MS'))
+        ref_date = date(2010, 1, 15)
+
+        offsets = axis.offsets_from(ref_date)
+        assert np.all(np.diff(offsets) == 1)
+        assert offsets[12] == 0
+        assert np.all(offsets == month_offsets(date(2009, 1, 1), date(2010, 12, 1), ref_date))
+        np.testing.assert_array_equal(growth_matrix(axis, [ref_date], [0.1])[:, 0],
+                                      growth_vector(date(2009, 1, 1), date(2010, 12, 1), ref_date, 0.1))
+
+    def test_growth_matrix_columns(self):
+        from table_data_reader import growth_matrix, month_axis
+        start_date = date(2009, 1, 1)
+        end_date = date(2010, 6, 1)
+        ref_dates = [date(2008, 6, 1), date(2009, 3, 1), date(2011, 1, 1)]
+        alphas = [0.1, -0.2, 0.3]
+
+        m = growth_matrix(month_axis(pd.date_range(start_date, end_date, freq='MS')), ref_dates, alphas)
+
+        assert m.shape == (18, 3)
+        for i, (ref_date, alpha) in enumerate(zip(ref_dates, alphas)):
+            assert np.all(m[:, i] == growth_vector(start_date, end_date, ref_date, alpha))